@@ -4,10 +4,14 @@ import io
 from datetime import date, datetime, timedelta, time
 from textwrap import dedent
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple, Union
 from string import Template
+from time import monotonic
 
 import json
+import re
+import numpy as np
+import openpyxl
 import pandas as pd
 import streamlit as st
 from dateutil import parser as dateparser
@@ -55,6 +59,31 @@ sidebar_panel = st.sidebar.empty()
 INFO_FIELD_DOCTOR = "doctor"
 INFO_FIELD_ROOM = "room"
 
+# Snellere Excel-parser voor bulk-imports indien geïnstalleerd (optioneel)
+try:
+    import python_calamine  # type: ignore  # noqa: F401
+    _EXCEL_ENGINE = "calamine"
+except Exception:
+    _EXCEL_ENGINE = "openpyxl"
+
+# FullCalendar-component: prefereer de lokale aangepaste build, anders streamlit-calendar
+try:
+    from src.webui.mega_calendar import calendar as st_calendar  # type: ignore
+    _USING_CUSTOM_CALENDAR = True
+except Exception:
+    _USING_CUSTOM_CALENDAR = False
+    try:
+        from streamlit_calendar import calendar as st_calendar  # type: ignore
+    except Exception:
+        st_calendar = None
+
+# Autosave als Arrow/Feather (kolomgewijs + LZ4); zonder pyarrow terug naar CSV
+try:
+    import pyarrow  # type: ignore  # noqa: F401
+    _HAS_PYARROW = True
+except Exception:
+    _HAS_PYARROW = False
+
 
 def load_csv_df(path: str, required_cols: List[str]) -> pd.DataFrame:
     p = Path(path)
@@ -69,6 +98,15 @@ def load_csv_df(path: str, required_cols: List[str]) -> pd.DataFrame:
     return df[required_cols]
 
 
+def load_feather_df(path: Path, required_cols: List[str]) -> pd.DataFrame:
+    df = pd.read_feather(path).fillna("")
+    for c in required_cols:
+        if c not in df.columns:
+            df[c] = ""
+    return df[required_cols]
+
+
+@st.cache_data(show_spinner=False)
 def _csv_template(columns: List[str], example_rows: List[List[str]]) -> str:
     df = pd.DataFrame(example_rows, columns=columns)
     buf = io.StringIO()
@@ -76,31 +114,128 @@ def _csv_template(columns: List[str], example_rows: List[List[str]]) -> str:
     return buf.getvalue()
 
 
+def _xlsx_bytes(sheets: Dict[str, pd.DataFrame]) -> bytes:
+    """Tabbladnaam -> DataFrame als .xlsx-bytes.
+
+    openpyxl in write_only-modus: rijen worden direct als XML weggeschreven, zonder per waarde
+    een cel-object (en headerstijl via pandas' ExcelFormatter) op te bouwen.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    for sheet, df in sheets.items():
+        ws = wb.create_sheet(title=sheet)
+        ws.append([str(c) for c in df.columns])
+        # Alleen een object-kopie (NaN -> lege cel) als er echt ontbrekende waarden zijn;
+        # de tabellen in state zijn meestal al met "" gevuld en worden dan rij voor rij gestreamd
+        if df.isna().to_numpy().any():
+            df = df.astype(object).where(df.notna(), None)
+        for row in df.itertuples(index=False, name=None):
+            ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+@st.cache_data(show_spinner=False)
 def _excel_template_sheets(sheets: Dict[str, Dict[str, List]] ) -> bytes:
     """
     sheets: { sheet_name: { 'columns': [...], 'rows': [[...], ...] } }
     """
-    bio = io.BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        for sheet, spec in sheets.items():
-            df = pd.DataFrame(spec.get("rows", []), columns=spec.get("columns", []))
-            df.to_excel(writer, index=False, sheet_name=sheet)
-    return bio.getvalue()
-
-
-def _wd_to_int(value) -> Optional[int]:
-    """Converteer weekday naar int 1..7; ondersteunt 'ma','di',... en cijfers."""
-    mapping = {"ma": 1, "di": 2, "wo": 3, "do": 4, "vr": 5, "za": 6, "zo": 7}
-    s = str(value).strip().lower()
-    if s in mapping:
-        return mapping[s]
+    return _xlsx_bytes({
+        sheet: pd.DataFrame(spec.get("rows", []), columns=spec.get("columns", []))
+        for sheet, spec in sheets.items()
+    })
+
+
+@st.cache_data(show_spinner=False)
+def _parse_upload(name: str, data: bytes) -> pd.DataFrame:
+    """Parse uploadbytes één keer per bestand; reruns met dezelfde upload komen uit de cache."""
+    if not name.lower().endswith(".xlsx"):
+        return pd.read_csv(io.BytesIO(data), dtype=str).fillna("")
+    if _EXCEL_ENGINE == "calamine":
+        return pd.read_excel(io.BytesIO(data), dtype=str, engine="calamine").fillna("")
+    # openpyxl in read_only-modus: rijen streamen i.p.v. het hele werkboek te materialiseren
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
     try:
-        v = int(s)
-        if 1 <= v <= 7:
-            return v
-    except Exception:
-        return None
-    return None
+        rows = wb.active.iter_rows(values_only=True)
+        headers = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+        records = [["" if v is None else str(v) for v in r] for r in rows if any(v is not None for v in r)]
+    finally:
+        wb.close()
+    return pd.DataFrame(records, columns=headers, dtype=str)
+
+
+def _read_upload(uploaded) -> pd.DataFrame:
+    """Lees een geüploade CSV/XLSX als tekstkolommen (Excel via calamine indien beschikbaar)."""
+    return _parse_upload(uploaded.name, uploaded.getvalue())
+
+
+def _new_session_id(existing_ids: Set[str], day: date, loc_id: str, hhmm: str) -> str:
+    """Unieke session_id `GEN-YYYYMMDD-<locatie>-HHMM`; bij botsing volgt een volgnummer."""
+    base = f"GEN-{day.strftime('%Y%m%d')}-{loc_id}-{hhmm}"
+    sid = base
+    k = 2
+    while sid in existing_ids:
+        sid = f"{base}-{k}"
+        k += 1
+    return sid
+
+
+def _append_rows(df: pd.DataFrame, rows: List) -> pd.DataFrame:
+    """Voeg rijen (lijsten of dicts per kolom) in één concat toe i.p.v. `df.loc[len(df)] = ...` per rij."""
+    if not rows:
+        return df
+    new = pd.DataFrame(rows, columns=df.columns)
+    if len(df) == 0:
+        return new
+    return pd.concat([df, new], ignore_index=True)
+
+
+def _doctor_label_map(doctors_df: pd.DataFrame) -> Dict[str, str]:
+    """doctor_id -> weergavenaam; per sessie bewaard zolang de tabel niet vervangen is. Niet muteren."""
+    cached = st.session_state.get("_doctor_label_map")
+    if cached is not None and cached[0] is doctors_df:
+        return cached[1]
+    ids = doctors_df["doctor_id"].astype(str)
+    names = doctors_df["name"].astype(str)
+    labels = {did: (nm or did) for did, nm in zip(ids, names)}
+    st.session_state["_doctor_label_map"] = (doctors_df, labels)
+    return labels
+
+
+def _room_names(rooms_df: pd.DataFrame, loc_id: str) -> List[str]:
+    """Kamernamen voor één locatie; per sessie bewaard zolang de tabel niet vervangen is. Niet muteren."""
+    cached = st.session_state.get("_room_names")
+    if cached is None or cached[0] is not rooms_df:
+        cached = (rooms_df, {})
+        st.session_state["_room_names"] = cached
+    by_loc: Dict[str, List[str]] = cached[1]
+    if loc_id not in by_loc:
+        rms = rooms_df[rooms_df["location_id"].astype(str).str.strip() == str(loc_id)]
+        by_loc[loc_id] = rms["name"].astype(str).fillna("").tolist()
+    return by_loc[loc_id]
+
+
+_WD_NAMES = {"ma": 1, "di": 2, "wo": 3, "do": 4, "vr": 5, "za": 6, "zo": 7}
+
+
+@st.cache_data(show_spinner=False)
+def _month_days(year: int, month: int) -> Tuple[List[date], int, int]:
+    """Dagen van een maand, weekdag (1=ma..7=zo) van de 1e en aantal kalenderrijen van 7 dagen."""
+    month_start = date(year, month, 1)
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    days = [month_start + timedelta(days=i) for i in range((next_month - month_start).days)]
+    first_wd = month_start.weekday() + 1  # Monday=0 -> 1..7
+    total_rows = ((first_wd - 1) + len(days) + 6) // 7
+    return days, first_wd, total_rows
+
+
+def _wd_series_to_int(values: pd.Series) -> pd.Series:
+    """Weekdag ('ma','di',... of 1..7) naar int 1..7 voor een hele kolom; ongeldige waarden worden <NA>."""
+    s = values.astype(str).str.strip().str.lower()
+    named = s.map(_WD_NAMES)
+    numeric = pd.to_numeric(s.where(s.str.fullmatch(r"[+-]?\d+")), errors="coerce")
+    numeric = numeric.where((numeric >= 1) & (numeric <= 7))
+    return named.fillna(numeric).astype("Int64")
 
 
 def _required_map() -> Dict[str, List[str]]:
@@ -116,6 +251,24 @@ def _required_map() -> Dict[str, List[str]]:
     }
 
 
+# Tabblad in megaplanner_data.xlsx -> tabelnaam in state.dfs
+_EXCEL_SHEET_NAMES = {
+    "Doctors": "doctors",
+    "Locations": "locations",
+    "Rooms": "rooms",
+    "Sessions": "sessions",
+    "Preferences": "preferences",
+    "TravelTimes": "travel_times",
+    "DoctorWorkdays": "doctor_workdays",
+    "DoctorWeekRules": "doctor_week_rules",
+}
+
+
+def _workbook_bytes(dfs: Dict[str, pd.DataFrame]) -> bytes:
+    """Alle tabellen als één .xlsx (tabbladen volgens _EXCEL_SHEET_NAMES)."""
+    return _xlsx_bytes({sheet: dfs[key] for sheet, key in _EXCEL_SHEET_NAMES.items()})
+
+
 def _load_from_excel_if_exists(path: Path) -> Optional[Dict[str, pd.DataFrame]]:
     if not path.exists():
         return None
@@ -123,17 +276,7 @@ def _load_from_excel_if_exists(path: Path) -> Optional[Dict[str, pd.DataFrame]]:
         xls = pd.ExcelFile(path)
         req = _required_map()
         dfs: Dict[str, pd.DataFrame] = {}
-        sheet_names = {
-            "Doctors": "doctors",
-            "Locations": "locations",
-            "Rooms": "rooms",
-            "Sessions": "sessions",
-            "Preferences": "preferences",
-            "TravelTimes": "travel_times",
-            "DoctorWorkdays": "doctor_workdays",
-            "DoctorWeekRules": "doctor_week_rules",
-        }
-        for sheet, key in sheet_names.items():
+        for sheet, key in _EXCEL_SHEET_NAMES.items():
             if sheet in xls.sheet_names:
                 df = pd.read_excel(path, sheet_name=sheet, dtype=str).fillna("")
                 cols = req[key]
@@ -149,37 +292,48 @@ def _load_from_excel_if_exists(path: Path) -> Optional[Dict[str, pd.DataFrame]]:
 
 
 def _load_from_custom_csvs(dir_path: Path) -> Optional[Dict[str, pd.DataFrame]]:
+    """Laad data/custom; per tabel wint het nieuwste bestand (autosave .feather of handmatige .csv)."""
     if not dir_path.exists():
         return None
     req = _required_map()
     keys = list(req.keys())
-    # Als geen enkel CSV-bestand bestaat, sla over
-    if not any((dir_path / f"{k}.csv").exists() for k in keys):
+    # Als geen enkel bestand bestaat, sla over
+    if not any((dir_path / f"{k}.csv").exists() or (dir_path / f"{k}.feather").exists() for k in keys):
         return None
     dfs: Dict[str, pd.DataFrame] = {}
     for k in keys:
-        p = dir_path / f"{k}.csv"
-        if p.exists():
-            dfs[k] = load_csv_df(p, req[k])
+        p_csv = dir_path / f"{k}.csv"
+        p_feather = dir_path / f"{k}.feather"
+        if _HAS_PYARROW and p_feather.exists() and (not p_csv.exists() or p_feather.stat().st_mtime >= p_csv.stat().st_mtime):
+            dfs[k] = load_feather_df(p_feather, req[k])
+        elif p_csv.exists():
+            dfs[k] = load_csv_df(p_csv, req[k])
         else:
             dfs[k] = pd.DataFrame(columns=req[k])
     return dfs
 
 
-def _save_all_to_custom(dfs: Dict[str, pd.DataFrame]) -> None:
+def _save_all_to_custom(dfs: Dict[str, pd.DataFrame], tables: Optional[Set[str]] = None) -> None:
+    """Schrijf tabellen naar data/custom; met `tables` alleen die (plus tabellen die nog geen bestand hebben)."""
     out_dir = Path("data/custom")
     out_dir.mkdir(parents=True, exist_ok=True)
     for k, cols in _required_map().items():
+        if tables is not None and k not in tables and ((out_dir / f"{k}.feather").exists() or (out_dir / f"{k}.csv").exists()):
+            continue
         df = dfs.get(k, pd.DataFrame(columns=cols)).copy()
         # force kolomvolgorde
         for c in cols:
             if c not in df.columns:
                 df[c] = ""
-        df[cols].to_csv(out_dir / f"{k}.csv", index=False)
+        if _HAS_PYARROW:
+            # Feather vereist uniforme kolomtypes en een standaard index
+            df[cols].fillna("").astype(str).reset_index(drop=True).to_feather(out_dir / f"{k}.feather", compression="lz4")
+        else:
+            df[cols].to_csv(out_dir / f"{k}.csv", index=False)
 
 
 def load_initial_data() -> Dict[str, pd.DataFrame]:
-    # 1) Probeer eerst custom CSV's (altijd meest actueel door autosave)
+    # 1) Probeer eerst custom data (autosave .feather of .csv; altijd meest actueel)
     dfs = _load_from_custom_csvs(Path("data/custom"))
     if dfs is not None:
         return dfs
@@ -193,16 +347,310 @@ def load_initial_data() -> Dict[str, pd.DataFrame]:
     return {k: load_csv_df(base / f"{k}.csv", cols) for k, cols in req.items()}
 
 
+class _DirtyDict(dict):
+    """dict van tabellen dat bijhoudt welke sleutels sinds de laatste autosave zijn toegewezen."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty: Set[str] = set()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.dirty.add(key)
+
+
 state = st.session_state
 if "dfs" not in state:
-    state.dfs = load_initial_data()
-
-def _autosave():
+    state.dfs = _DirtyDict(load_initial_data())
+elif not hasattr(state.dfs, "dirty"):
+    state.dfs = _DirtyDict(state.dfs)
+
+_AUTOSAVE_INTERVAL_S = 2.0
+
+
+def _autosave(force: bool = False):
+    # Alleen gewijzigde tabellen wegschrijven, hooguit eens per _AUTOSAVE_INTERVAL_S zodat snelle
+    # opeenvolgende klikken niet elk een schrijfactie kosten; wat in `dirty` blijft staan schrijft
+    # _autosave_pending weg zodra het interval om is.
+    if not state.dfs.dirty:
+        return
+    now = monotonic()
+    if not force and now - state.get("_last_autosave", float("-inf")) < _AUTOSAVE_INTERVAL_S:
+        return
     try:
-        _save_all_to_custom(state.dfs)
+        _flush_date_sets()
+        _save_all_to_custom(state.dfs, tables=set(state.dfs.dirty))
+        state.dfs.dirty.clear()
+        state["_last_autosave"] = now
     except Exception:
         pass
 
+
+@st.fragment(run_every=_AUTOSAVE_INTERVAL_S)
+def _autosave_pending():
+    # Loopt los van het script op een timer zolang er iets in `dirty` staat: uitgestelde
+    # wijzigingen komen zo ook zonder volgende interactie op schijf
+    _autosave()
+
+
+# Wijzigingen van een run die met een rerun is afgebroken alsnog wegschrijven (als het interval om is)
+_autosave()
+
+
+def _create_session(day: date, loc_id: str, start_hhmm: str, end_hhmm: str, title: str, room: str = "", doctor_id: Optional[str] = None) -> str:
+    """Voeg een sessie toe (optioneel met handmatige arts-koppeling), sla op en retourneer de session_id."""
+    sess_df = state.dfs["sessions"]
+    existing = set(sess_df["session_id"].astype(str)) if len(sess_df) else set()
+    sid = _new_session_id(existing, day, loc_id, start_hhmm.replace(":", ""))
+    state.dfs["sessions"] = _append_rows(sess_df, [{
+        "session_id": sid,
+        "date": day.strftime("%Y-%m-%d"),
+        "location_id": loc_id,
+        "start_time": start_hhmm,
+        "end_time": end_hhmm,
+        "required_skill": title,
+        "room": room or "",
+    }])
+    if doctor_id:
+        if not hasattr(state, "manual_assignments"):
+            state.manual_assignments = {}
+        state.manual_assignments[sid] = doctor_id
+    _autosave()
+    return sid
+
+
+@st.cache_data(show_spinner=False)
+def _load_schedule(path: str, mtime: float) -> pd.DataFrame:
+    """Planning-CSV als tekst; `mtime` hoort bij de cachesleutel zodat een nieuw bestand opnieuw wordt gelezen."""
+    return pd.read_csv(path, dtype=str).fillna("")
+
+
+def _group_positions(df: pd.DataFrame, key: str) -> List[Tuple[object, np.ndarray]]:
+    # Groepen als (sleutel, rijposities) in volgorde van eerste voorkomen; df is al op `key` gesorteerd
+    indices = df.groupby(key, sort=False, observed=True).indices
+    return sorted(indices.items(), key=lambda kv: kv[1][0])
+
+
+def _agenda_data() -> Tuple[pd.DataFrame, List[str], List[str]]:
+    """Planning met geparste datums plus arts-/locatieopties; opnieuw opgebouwd zodra state.schedule_df vervangen is."""
+    df = state.schedule_df
+    cached = state.get("_agenda_data")
+    if cached is not None and cached[0] is df:
+        return cached[1]
+    sched = df.copy()
+    # datetime64 i.p.v. date-objecten: de datumfilters worden dan numpy-vergelijkingen
+    sched["date"] = pd.to_datetime(sched["date"], errors="coerce")
+    # Categorical: isin in de filters vergelijkt dan integer-codes i.p.v. strings
+    sched["doctor_name"] = sched["doctor_name"].astype("category")
+    sched["location_id"] = sched["location_id"].astype("category")
+    result = (
+        sched,
+        sorted(sched["doctor_name"].cat.categories.tolist()),
+        sorted(sched["location_id"].cat.categories.tolist()),
+    )
+    state["_agenda_data"] = (df, result)
+    return result
+
+
+def _doctor_row_index() -> Dict[str, int]:
+    """doctor_id -> rij-label in state.dfs['doctors']; opnieuw opgebouwd zodra de tabel vervangen is."""
+    df = state.dfs["doctors"]
+    cached = state.get("_doctor_row_index")
+    if cached is not None and cached[0] is df:
+        return cached[1]
+    index: Dict[str, int] = {}
+    for i, v in zip(df.index, df["doctor_id"].astype(str).str.strip()):
+        index.setdefault(v, i)
+    state["_doctor_row_index"] = (df, index)
+    return index
+
+
+def _doctors_sorted() -> pd.DataFrame:
+    """Artsen gesorteerd op naam/id; de volgorde wordt per tabelversie één keer bepaald."""
+    df = state.dfs["doctors"]
+    cached = state.get("_doctors_order")
+    if cached is None or cached[0] is not df:
+        cached = (df, df.sort_values(["name", "doctor_id"]).index)
+        state["_doctors_order"] = cached
+    # rijen ophalen uit de actuele tabel: cellen kunnen in-place gewijzigd zijn
+    return df.loc[cached[1]]
+
+
+def _workdays_by_doctor() -> Dict[str, Set[int]]:
+    """doctor_id -> vaste werkdagen (1..7); eenmaal geparst per versie van state.dfs['doctor_workdays']."""
+    df = state.dfs["doctor_workdays"]
+    cached = state.get("_workdays_by_doctor")
+    if cached is not None and cached[0] is df:
+        return cached[1]
+    wd = _wd_series_to_int(df["weekday"])
+    valid = wd.notna()
+    result: Dict[str, Set[int]] = {}
+    for did, v in zip(df["doctor_id"].astype(str).str.strip()[valid], wd[valid]):
+        result.setdefault(did, set()).add(int(v))
+    state["_workdays_by_doctor"] = (df, result)
+    return result
+
+
+def _doctor_date_sets() -> Dict[str, Dict[str, Set[date]]]:
+    """kolom -> doctor_id -> datums voor de ;-gescheiden datumkolommen.
+
+    Eén gevectoriseerde parse per tabelversie; daarna houdt `_update_doctor` de sets per arts bij,
+    zodat een klik geen nieuwe parse van de hele kolom kost.
+    """
+    df = state.dfs["doctors"]
+    cached = state.get("_doctor_date_sets")
+    if cached is not None and cached[0] is df:
+        return cached[1]
+    ids = df["doctor_id"].astype(str).str.strip()
+    result: Dict[str, Dict[str, Set[date]]] = {}
+    for col in ("unavailable_dates", "available_dates", "home_dates"):
+        per_doc: Dict[str, Set[date]] = {}
+        if col in df.columns:
+            parts = df[col].astype(str).str.split(";").explode().str.strip()
+            parsed = pd.to_datetime(parts, format="%Y-%m-%d", errors="coerce").dropna()
+            for did, d in zip(ids.loc[parsed.index], parsed.dt.date):
+                per_doc.setdefault(did, set()).add(d)
+        result[col] = per_doc
+    # Nieuwe tabelversie: nog niet teruggezette sets van de vorige versie vervallen
+    state.pop("_dates_pending", None)
+    state["_doctor_date_sets"] = (df, result)
+    return result
+
+
+def _serialize_dates(values: Set[date]) -> str:
+    return ";".join(sorted(d.isoformat() for d in values))
+
+
+def _parse_date_list(text: str) -> Set[date]:
+    """Eén ;-gescheiden datumlijst (YYYY-MM-DD); ongeldige items worden overgeslagen."""
+    out: Set[date] = set()
+    for tok in str(text).split(";"):
+        try:
+            out.add(datetime.strptime(tok.strip(), "%Y-%m-%d").date())
+        except ValueError:
+            continue
+    return out
+
+
+def _update_doctor(did: str, **values: Union[str, Set[date]]) -> bool:
+    """Werk kolommen van één arts in-place bij (zonder kopie van de tabel); False als de arts niet bestaat.
+
+    Datumkolommen mogen als set worden meegegeven; dan wordt alleen de gecachte datumset bijgewerkt
+    en komt de ;-tekst pas bij `_flush_date_sets` (opslaan/exporteren) terug in de tabel.
+    """
+    df = state.dfs["doctors"]
+    i = _doctor_row_index().get(did)
+    if i is None:
+        return False
+    date_sets = _doctor_date_sets()
+    for col, val in values.items():
+        if col not in df.columns:
+            continue
+        if col in date_sets:
+            if isinstance(val, (set, frozenset)):
+                date_sets[col][did] = set(val)
+                state.setdefault("_dates_pending", set()).add((did, col))
+                continue
+            date_sets[col][did] = _parse_date_list(val)
+            state.get("_dates_pending", set()).discard((did, col))
+        df.at[i, col] = val
+    state.dfs.dirty.add("doctors")
+    if "name" in values:
+        state.pop("_doctors_order", None)
+        state.pop("_doctor_label_map", None)
+    return True
+
+
+def _flush_date_sets(did: Optional[str] = None) -> None:
+    """Zet via `_update_doctor` gewijzigde datumsets terug als ;-tekst in de artsentabel (alle, of alleen van `did`)."""
+    pending = state.get("_dates_pending")
+    if not pending:
+        return
+    df = state.dfs["doctors"]
+    cached = state.get("_doctor_date_sets")
+    if cached is None or cached[0] is not df:
+        # Tabel is in z'n geheel vervangen (bv. Excel-import): de sets horen bij de oude versie
+        pending.clear()
+        return
+    rows = _doctor_row_index()
+    for key in [k for k in pending if did is None or k[0] == did]:
+        owner, col = key
+        i = rows.get(owner)
+        if i is not None:
+            df.at[i, col] = _serialize_dates(cached[1][col].get(owner, ()))
+        pending.discard(key)
+
+
+def _write_dateset(did: str, col: str, values: Set[date]) -> bool:
+    """Schrijf één datumkolom van een arts weg en plan een autosave; False als de arts niet bestaat."""
+    if not _update_doctor(did, **{col: values}):
+        return False
+    _autosave()
+    return True
+
+
+_WEEKDAY_LABELS = ["ma", "di", "wo", "do", "vr", "za", "zo"]
+
+
+def _month_mask(days: List[date], values: Set[date]) -> int:
+    """Bitmasker van een maand: bit i staat aan als days[i] in `values` zit."""
+    mask = 0
+    for i, dte in enumerate(days):
+        if dte in values:
+            mask |= 1 << i
+    return mask
+
+
+def _calendar_grid(year: int, month: int, mask: int) -> pd.DataFrame:
+    """Maandraster (weken × ma..zo) met vinkjes voor de dagen in `mask` (zie `_month_mask`); index = weeknummer."""
+    days, first_wd, total_rows = _month_days(year, month)
+    cells = [[False] * 7 for _ in range(total_rows)]
+    labels = []
+    for r in range(total_rows):
+        idx = max(r * 7 - (first_wd - 1), 0)
+        labels.append(f"wk {days[idx].isocalendar()[1]:02d}")
+    for idx, dte in enumerate(days):
+        slot = idx + first_wd - 1
+        cells[slot // 7][slot % 7] = bool((mask >> idx) & 1)
+    return pd.DataFrame(cells, index=labels, columns=_WEEKDAY_LABELS)
+
+
+def _apply_calendar_edits(did: str, key: str, year: int, month: int) -> None:
+    """on_change van het maandraster: zet aangevinkte/uitgevinkte cellen om naar datums van de actieve modus."""
+    edits = state[key].get("edited_rows", {})
+    days, first_wd, _ = _month_days(year, month)
+    mode = state.get(f"cal_mode_{did}", "Onbeschikbaar")
+    date_sets = _doctor_date_sets()
+    unavail = set(date_sets["unavailable_dates"].get(did, ()))
+    avail = set(date_sets["available_dates"].get(did, ()))
+    home = set(date_sets["home_dates"].get(did, ()))
+    target = unavail if mode.startswith("Onbeschik") else home if mode.startswith("Thuis") else avail
+    for row, changed in edits.items():
+        for label, checked in changed.items():
+            idx = int(row) * 7 + _WEEKDAY_LABELS.index(label) - (first_wd - 1)
+            if not 0 <= idx < len(days):
+                continue  # cel buiten de maand
+            dte = days[idx]
+            if not checked:
+                target.discard(dte)
+                continue
+            target.add(dte)
+            if target is unavail:
+                # rood overschrijft anderen
+                avail.discard(dte)
+                home.discard(dte)
+            else:
+                unavail.discard(dte)
+    changed = {
+        col: new
+        for col, new in (("unavailable_dates", unavail), ("available_dates", avail), ("home_dates", home))
+        if new != date_sets[col].get(did, set())
+    }
+    if changed and _update_doctor(did, **changed):
+        _autosave()
+    # nieuwe editor-sleutel: de volgende run start met een schoon raster op basis van de opgeslagen data
+    state[f"cal_ver_{did}"] = state.get(f"cal_ver_{did}", 0) + 1
+
 with st.expander("Optioneel: Excel-bestand uploaden (meerdere tabbladen)"):
     uploaded = st.file_uploader("Upload Excel (.xlsx) met tabbladen: Doctors, Locations, Sessions, Preferences, TravelTimes, DoctorWorkdays, DoctorWeekRules", type=["xlsx"])
     if uploaded is not None:
@@ -230,6 +678,7 @@ with st.expander("Optioneel: Excel-bestand uploaden (meerdere tabbladen)"):
 
 if mode == "Beheer (tabel)":
     st.subheader("Data bewerken")
+    _flush_date_sets()
     tabs = st.tabs(["Doctors", "Locations", "Rooms", "Sessions", "Preferences", "TravelTimes", "DoctorWorkdays", "DoctorWeekRules"])
     keys = ["doctors", "locations", "rooms", "sessions", "preferences", "travel_times", "doctor_workdays", "doctor_week_rules"]
     for t, key in zip(tabs, keys):
@@ -260,6 +709,7 @@ else:
                 buf.seek(0)
                 return buf
 
+            _flush_date_sets()
             doctors = read_doctors(df_to_csv_bytes(state.dfs["doctors"]))
             locations = read_locations(df_to_csv_bytes(state.dfs["locations"]))
             sessions = read_sessions(df_to_csv_bytes(state.dfs["sessions"]))
@@ -330,7 +780,9 @@ else:
         if len(loc_df) == 0:
             st.info("Geen locaties beschikbaar. Voeg eerst locaties toe.")
         else:
-            loc_options = [(str(r.get("name","")) or str(r["location_id"]), str(r["location_id"])) for _, r in loc_df.iterrows()]
+            loc_ids = loc_df["location_id"].astype(str)
+            loc_names = loc_df["name"].astype(str)
+            loc_options = list(zip(loc_names.where(loc_names.str.len() > 0, loc_ids), loc_ids))
             sel_loc_label = st.selectbox("Locatie", [lbl for (lbl, _id) in loc_options], index=0)
             sel_loc = dict(loc_options)[sel_loc_label]
             # Kameropties voor locatie
@@ -364,42 +816,18 @@ else:
                 ap_date = st.date_input("Datum", value=pick, min_value=week_start, max_value=week_end, key="ap_date_new")
                 ap_start = st.time_input("Start", value=datetime.now().replace(hour=9, minute=0).time(), key="ap_start_new")
                 ap_end = st.time_input("Einde", value=datetime.now().replace(hour=10, minute=0).time(), key="ap_end_new")
-                ap_room = st.selectbox("Kamer (optioneel)", [""] + rooms_for_loc["name"].astype(str).fillna("").tolist(), index=0, key="ap_room_new")
+                ap_room = st.selectbox("Kamer (optioneel)", [""] + _room_names(room_df, sel_loc), index=0, key="ap_room_new")
                 # Arts (optioneel) om direct te koppelen
                 docs_df_all = state.dfs.get("doctors", pd.DataFrame(columns=["doctor_id","name"]))
-                doc_opts = [""] + [f'{str(r.get("name","")) or str(r["doctor_id"])} [{str(r["doctor_id"])}]' for _, r in docs_df_all.iterrows()]
+                doc_opts = [""] + [f"{nm} [{did}]" for did, nm in _doctor_label_map(docs_df_all).items()]
                 ap_doc_label = st.selectbox("Arts (optioneel)", doc_opts, index=0, key="ap_doc_new")
                 ap_skill = st.text_input("Titel / opmerking (wordt getoond)", value="", key="ap_skill_new")
                 if st.button("Opslaan (voeg toe)"):
-                    # maak unieke session_id
-                    def _make_id(d: date, loc: str, hh: int, mm: int) -> str:
-                        base = f"GEN-{d.strftime('%Y%m%d')}-{loc}-{hh:02d}{mm:02d}"
-                        sid = base
-                        k = 2
-                        existing = set(sess_df["session_id"].astype(str)) if len(sess_df) else set()
-                        while sid in existing:
-                            sid = f"{base}-{k}"; k += 1
-                        return sid
-                    sid = _make_id(ap_date, sel_loc, ap_start.hour, ap_start.minute)
-                    new_row = {
-                        "session_id": sid,
-                        "date": ap_date.isoformat(),
-                        "location_id": sel_loc,
-                        "start_time": f"{ap_start.hour:02d}:{ap_start.minute:02d}",
-                        "end_time": f"{ap_end.hour:02d}:{ap_end.minute:02d}",
-                        "required_skill": ap_skill,
-                        "room": ap_room or "",
-                    }
-                    sess2 = state.dfs.get("sessions", pd.DataFrame(columns=list(new_row.keys()))).copy()
-                    sess2.loc[len(sess2)] = new_row
-                    state.dfs["sessions"] = sess2
                     # Koppel arts indien gekozen
+                    did = None
                     if ap_doc_label and "[" in ap_doc_label and "]" in ap_doc_label:
                         did = ap_doc_label.split("[")[-1].split("]")[0].strip()
-                        if not hasattr(state, "manual_assignments"):
-                            state.manual_assignments = {}
-                        state.manual_assignments[sid] = did
-                    _autosave()
+                    _create_session(ap_date, sel_loc, ap_start.strftime("%H:%M"), ap_end.strftime("%H:%M"), ap_skill, ap_room, did)
                     st.success("Afspraak toegevoegd.")
 
             # Filter sessies
@@ -419,17 +847,11 @@ else:
             else:
                 sess_tmp = sess_tmp[mask]
 
-            # FullCalendar integratie (prefereer lokale aangepaste build)
-            using_custom_calendar = False
-            try:
-                from src.webui.mega_calendar import calendar as st_calendar  # type: ignore
-                using_custom_calendar = True
-            except Exception:
-                try:
-                    from streamlit_calendar import calendar as st_calendar  # type: ignore
-                except Exception:
-                    st.error("De kalendercomponent ontbreekt. Installeer dependencies met: pip install -r requirements.txt")
-                    st.stop()
+            # FullCalendar integratie (component wordt bij het laden van de module geïmporteerd)
+            using_custom_calendar = _USING_CUSTOM_CALENDAR
+            if st_calendar is None:
+                st.error("De kalendercomponent ontbreekt. Installeer dependencies met: pip install -r requirements.txt")
+                st.stop()
 
             # Zorg voor container voor handmatige arts-toewijzingen
             if not hasattr(state, "manual_assignments"):
@@ -453,7 +875,7 @@ else:
                     j += 1
 
             doctor_df = state.dfs.get("doctors", pd.DataFrame(columns=["doctor_id","name"]))
-            doc_label_map = {str(rr["doctor_id"]): (str(rr.get("name","")) or str(rr["doctor_id"])) for _, rr in doctor_df.iterrows()}
+            doc_label_map = _doctor_label_map(doctor_df)
             doctor_meta = [{"id": did, "label": nm} for did, nm in doc_label_map.items()]
 
             room_meta: list[dict[str, str]] = []
@@ -478,7 +900,6 @@ else:
                 dte = str(r["date"]).strip()
                 sid = str(r["session_id"])
                 # voeg artsnaam toe aan titel indien handmatig toegewezen
-                doctor_meta = [{"id": did, "label": nm} for did, nm in doc_label_map.items()]
                 doc_suffix = ""
                 if sid in state.manual_assignments:
                     did = state.manual_assignments.get(sid)
@@ -619,9 +1040,9 @@ else:
                     st.write(f"{start_label} – {end_label}")
                     with st.form("new_session_fullcalendar"):
                         title = st.text_input("Titel/opmerking", value="Spreekuur")
-                        room_choice = st.selectbox("Kamer", [""] + rooms_for_loc["name"].astype(str).fillna("").tolist(), index=0)
+                        room_choice = st.selectbox("Kamer", [""] + _room_names(room_df, sel_loc), index=0)
                         doctor_df = state.dfs.get("doctors", pd.DataFrame(columns=["doctor_id","name"]))
-                        doc_label_map = {str(r["doctor_id"]): (str(r.get("name","")) or str(r["doctor_id"])) for _, r in doctor_df.iterrows()}
+                        doc_label_map = _doctor_label_map(doctor_df)
                         doc_label = st.selectbox("Arts (optioneel)", ["(geen)"] + [f"{nm} [{did}]" for did, nm in doc_label_map.items()], index=0)
                         # Tijd aanpassen (zoals Outlook)
                         sel_date = st.date_input("Datum", value=(sdt.date() if sdt else week_start), min_value=week_start, max_value=week_end, key="new_dt")
@@ -638,30 +1059,10 @@ else:
                             if not sel_date or not start_time_val or not end_time_val:
                                 st.error("Tijdselectie niet correct ontvangen. Probeer opnieuw te slepen.")
                                 st.stop()
-                            sid_base = f"GEN-{sel_date.strftime('%Y%m%d')}-{sel_loc}-{start_time_val.strftime('%H%M')}"
-                            sid = sid_base; i = 2
-                            existing = set(state.dfs["sessions"]["session_id"].astype(str))
-                            while sid in existing: sid = f"{sid_base}-{i}"; i += 1
-                            new_row = {
-                                "session_id": sid,
-                                "date": sel_date.strftime("%Y-%m-%d"),
-                                "location_id": sel_loc,
-                                "start_time": start_time_val.strftime("%H:%M"),
-                                "end_time": end_time_val.strftime("%H:%M"),
-                                "required_skill": title,
-                                "room": room_choice or "",
-                            }
-                            sess2 = state.dfs["sessions"].copy()
-                            sess2.loc[len(sess2)] = new_row
-                            state.dfs["sessions"] = sess2
-                        if doc_label != "(geen)":
-                            did = doc_label.split("[")[-1].split("]")[0].strip()
-                            if not hasattr(state, "manual_assignments"):
-                                state.manual_assignments = {}
-                            state.manual_assignments[sid] = did
-                        _autosave()
-                        st.success("Sessie toegevoegd.")
-                        _safe_rerun()
+                            did = doc_label.split("[")[-1].split("]")[0].strip() if doc_label != "(geen)" else None
+                            _create_session(sel_date, sel_loc, start_time_val.strftime("%H:%M"), end_time_val.strftime("%H:%M"), title, room_choice, did)
+                            st.success("Sessie toegevoegd.")
+                            _safe_rerun()
 
             # Klik op lege tijdslot (zonder slepen) → maak pop-up met default 1 uur
             if cb == "dateClick" and isinstance(data, dict) and not using_custom_calendar:
@@ -673,9 +1074,9 @@ else:
                 with container:
                     with st.form("new_session_click"):
                         title = st.text_input("Titel/opmerking", value="Spreekuur")
-                        room_choice = st.selectbox("Kamer", [""] + rooms_for_loc["name"].astype(str).fillna("").tolist(), index=0, key="click_room")
+                        room_choice = st.selectbox("Kamer", [""] + _room_names(room_df, sel_loc), index=0, key="click_room")
                         doctor_df = state.dfs.get("doctors", pd.DataFrame(columns=["doctor_id","name"]))
-                        doc_label_map = {str(r["doctor_id"]): (str(r.get("name","")) or str(r["doctor_id"])) for _, r in doctor_df.iterrows()}
+                        doc_label_map = _doctor_label_map(doctor_df)
                         doc_label = st.selectbox("Arts (optioneel)", ["(geen)"] + [f"{nm} [{did}]" for did, nm in doc_label_map.items()], index=0, key="click_doc")
                         sel_date = st.date_input("Datum", value=sdt.date(), min_value=week_start, max_value=week_end, key="click_date")
                         c1, c2 = st.columns(2)
@@ -685,27 +1086,8 @@ else:
                             end_time_val = st.time_input("Einde", value=edt.time(), key="click_end")
                         save = st.form_submit_button("Opslaan")
                         if save:
-                            sid_base = f"GEN-{sel_date.strftime('%Y%m%d')}-{sel_loc}-{start_time_val.strftime('%H%M')}"
-                            sid = sid_base; i = 2
-                            existing = set(state.dfs["sessions"]["session_id"].astype(str))
-                            while sid in existing: sid = f"{sid_base}-{i}"; i += 1
-                            sess2 = state.dfs["sessions"].copy()
-                            sess2.loc[len(sess2)] = {
-                                "session_id": sid,
-                                "date": sel_date.strftime("%Y-%m-%d"),
-                                "location_id": sel_loc,
-                                "start_time": start_time_val.strftime("%H:%M"),
-                                "end_time": end_time_val.strftime("%H:%M"),
-                                "required_skill": title,
-                                "room": room_choice or "",
-                            }
-                            state.dfs["sessions"] = sess2
-                            if doc_label != "(geen)":
-                                did = doc_label.split("[")[-1].split("]")[0].strip()
-                                if not hasattr(state, "manual_assignments"):
-                                    state.manual_assignments = {}
-                                state.manual_assignments[sid] = did
-                            _autosave()
+                            did = doc_label.split("[")[-1].split("]")[0].strip() if doc_label != "(geen)" else None
+                            _create_session(sel_date, sel_loc, start_time_val.strftime("%H:%M"), end_time_val.strftime("%H:%M"), title, room_choice, did)
                             st.success("Sessie toegevoegd.")
                             _safe_rerun()
 
@@ -723,28 +1105,7 @@ else:
                         sel_date_val = datetime.strptime(sel_date_txt, "%Y-%m-%d").date()
                     except ValueError:
                         sel_date_val = week_start
-                    sid_base = f"GEN-{sel_date_val.strftime('%Y%m%d')}-{sel_loc}-{start_txt.replace(':','')}"
-                    sid = sid_base; i = 2
-                    existing = set(state.dfs["sessions"]["session_id"].astype(str))
-                    while sid in existing:
-                        sid = f"{sid_base}-{i}"
-                        i += 1
-                    sess2 = state.dfs["sessions"].copy()
-                    sess2.loc[len(sess2)] = {
-                        "session_id": sid,
-                        "date": sel_date_val.strftime("%Y-%m-%d"),
-                        "location_id": sel_loc,
-                        "start_time": start_txt,
-                        "end_time": end_txt,
-                        "required_skill": title_txt,
-                        "room": room_choice,
-                    }
-                    state.dfs["sessions"] = sess2
-                    if doctor_choice:
-                        if not hasattr(state, "manual_assignments"):
-                            state.manual_assignments = {}
-                        state.manual_assignments[sid] = doctor_choice
-                    _autosave()
+                    _create_session(sel_date_val, sel_loc, start_txt, end_txt, title_txt, room_choice, doctor_choice or None)
                     st.success("Sessie toegevoegd.")
                     _safe_rerun()
 
@@ -753,17 +1114,22 @@ else:
                 sid = str(ev.get("id",""))
                 sdt = _parse_dt(ev.get("start")); edt = _parse_dt(ev.get("end"))
                 if sid and sdt and edt:
-                    df = state.dfs["sessions"].copy()
+                    # eventChange komt vaak direct na eventDrop/eventResize met dezelfde tijden
+                    # (en de component geeft het laatste event na een rerun opnieuw terug):
+                    # alleen schrijven als de sessie werkelijk verandert t.o.v. de huidige rij.
+                    sig = (sdt.strftime("%Y-%m-%d"), sdt.strftime("%H:%M"), edt.strftime("%H:%M"))
+                    df = state.dfs["sessions"]
                     idx = df.index[df["session_id"].astype(str) == sid].tolist()
                     if idx:
                         i = idx[0]
-                        df.at[i, "date"] = sdt.strftime("%Y-%m-%d")
-                        df.at[i, "start_time"] = sdt.strftime("%H:%M")
-                        df.at[i, "end_time"] = edt.strftime("%H:%M")
-                        state.dfs["sessions"] = df
-                        _autosave()
-                        st.success("Sessie bijgewerkt.")
-                        _safe_rerun()
+                        current = (str(df.at[i, "date"]).strip(), str(df.at[i, "start_time"]).strip(), str(df.at[i, "end_time"]).strip())
+                        if current != sig:
+                            df = df.copy()
+                            df.at[i, "date"], df.at[i, "start_time"], df.at[i, "end_time"] = sig
+                            state.dfs["sessions"] = df
+                            _autosave()
+                            st.success("Sessie bijgewerkt.")
+                            _safe_rerun()
 
             if cb == "eventClick" and isinstance(data, dict):
                 # Toon overlay met samenvatting; geen bewerkformulier hier
@@ -807,24 +1173,9 @@ else:
                         new_start = st.time_input("Start", value=datetime.now().replace(hour=9, minute=0).time())
                         new_end = st.time_input("Einde", value=datetime.now().replace(hour=10, minute=0).time())
                         new_title = st.text_input("Titel/opmerking", value="Spreekuur")
-                        new_room = st.selectbox("Kamer", [""] + rooms_for_loc["name"].astype(str).fillna("").tolist(), index=0, key="fb_room")
+                        new_room = st.selectbox("Kamer", [""] + _room_names(room_df, sel_loc), index=0, key="fb_room")
                         if st.form_submit_button("Toevoegen"):
-                            sid_base = f"GEN-{new_date.strftime('%Y%m%d')}-{sel_loc}-{new_start.strftime('%H%M')}"
-                            sid = sid_base; i = 2
-                            existing = set(state.dfs["sessions"]["session_id"].astype(str))
-                            while sid in existing: sid = f"{sid_base}-{i}"; i += 1
-                            sess2 = state.dfs["sessions"].copy()
-                            sess2.loc[len(sess2)] = {
-                                "session_id": sid,
-                                "date": new_date.strftime("%Y-%m-%d"),
-                                "location_id": sel_loc,
-                                "start_time": new_start.strftime("%H:%M"),
-                                "end_time": new_end.strftime("%H:%M"),
-                                "required_skill": new_title,
-                                "room": new_room or "",
-                            }
-                            state.dfs["sessions"] = sess2
-                            _autosave()
+                            _create_session(new_date, sel_loc, new_start.strftime("%H:%M"), new_end.strftime("%H:%M"), new_title, new_room)
                             st.success("Sessie toegevoegd.")
                             _safe_rerun()
                 with cols_fb[1]:
@@ -880,12 +1231,12 @@ else:
                         except Exception:
                             end_val = time(10,0)
 
-                        room_names = [""] + rooms_for_loc["name"].astype(str).fillna("").tolist()
+                        room_names = [""] + _room_names(room_df, sel_loc)
                         current_room = str(r.get("room","")).strip()
                         room_idx = room_names.index(current_room) if current_room in room_names else 0
 
                         doctor_df = state.dfs.get("doctors", pd.DataFrame(columns=["doctor_id","name"]))
-                        doc_label_map = {str(rr["doctor_id"]): (str(rr.get("name","")) or str(rr["doctor_id"])) for _, rr in doctor_df.iterrows()}
+                        doc_label_map = _doctor_label_map(doctor_df)
                         doc_options = ["(geen)"] + [f"{nm} [{did}]" for did, nm in doc_label_map.items()]
                         current_did = state.manual_assignments.get(sid, "")
                         default_doc_idx = 0
@@ -894,16 +1245,18 @@ else:
                             if label in doc_options:
                                 default_doc_idx = doc_options.index(label)
 
+                        # Widget-keys eenmalig per sessie opbouwen
+                        wkeys = {name: f"{name}_sidebar_{sid}" for name in ("title", "date", "start", "end", "room", "doc")}
                         with st.form(f"sidebar_edit_{sid}"):
-                            title = st.text_input("Titel/opmerking", value=str(r.get("required_skill","")), key=f"title_sidebar_{sid}")
-                            date_input = st.date_input("Datum", value=date_val, key=f"date_sidebar_{sid}")
+                            title = st.text_input("Titel/opmerking", value=str(r.get("required_skill","")), key=wkeys["title"])
+                            date_input = st.date_input("Datum", value=date_val, key=wkeys["date"])
                             col_ta, col_tb = st.columns(2)
                             with col_ta:
-                                start_input = st.time_input("Start", value=start_val, key=f"start_sidebar_{sid}")
+                                start_input = st.time_input("Start", value=start_val, key=wkeys["start"])
                             with col_tb:
-                                end_input = st.time_input("Einde", value=end_val, key=f"end_sidebar_{sid}")
-                            room_choice = st.selectbox("Kamer", room_names, index=room_idx, key=f"room_sidebar_{sid}")
-                            doc_choice = st.selectbox("Arts (optioneel)", doc_options, index=default_doc_idx, key=f"doc_sidebar_{sid}")
+                                end_input = st.time_input("Einde", value=end_val, key=wkeys["end"])
+                            room_choice = st.selectbox("Kamer", room_names, index=room_idx, key=wkeys["room"])
+                            doc_choice = st.selectbox("Arts (optioneel)", doc_options, index=default_doc_idx, key=wkeys["doc"])
                             save = st.form_submit_button("Opslaan")
                             delete = st.form_submit_button("Verwijderen")
 
@@ -999,10 +1352,7 @@ else:
             overwrite = st.checkbox("Bestaande overschrijven (op location_id)", value=False, key="bulk_locations_overwrite")
             if st.button("Importeer locaties", disabled=uploaded_loc is None):
                 try:
-                    if uploaded_loc.name.lower().endswith(".xlsx"):
-                        df_new = pd.read_excel(uploaded_loc, dtype=str).fillna("")
-                    else:
-                        df_new = pd.read_csv(uploaded_loc, dtype=str).fillna("")
+                    df_new = _read_upload(uploaded_loc)
                     required = ["location_id", "name", "default_start_time", "default_end_time"]
                     missing = [c for c in required if c not in df_new.columns]
                     if missing:
@@ -1040,7 +1390,9 @@ else:
             with st.form("add_room_form"):
                 st.caption("Nieuwe kamer")
                 loc_df = state.dfs["locations"]
-                loc_options = [(r["name"] or r["location_id"], r["location_id"]) for _, r in loc_df.iterrows()]
+                loc_ids = loc_df["location_id"].astype(str)
+                loc_names = loc_df["name"].astype(str)
+                loc_options = list(zip(loc_names.where(loc_names.str.len() > 0, loc_ids), loc_ids))
                 selected_loc_label = st.selectbox("Locatie", [label for label, _ in loc_options], key="room_loc_label")
                 selected_loc_id = dict(loc_options).get(selected_loc_label, None)
                 new_room_id = st.text_input("room_id", key="new_room_id")
@@ -1127,14 +1479,22 @@ else:
                 submit_doc = st.form_submit_button("Arts toevoegen")
                 if submit_doc:
                     try:
-                        docs_df = state.dfs["doctors"].copy()
+                        _flush_date_sets()
+                        docs_df = state.dfs["doctors"]
                         if doc_id and doc_id not in set(docs_df["doctor_id"].astype(str)):
                             try:
                                 _ = int(str(doc_max).strip())
                             except Exception:
                                 raise ValueError("max_sessions moet een geheel getal zijn.")
-                            docs_df.loc[len(docs_df)] = [doc_id, doc_name, int(doc_max), doc_unavail, doc_skills]
-                            state.dfs["doctors"] = docs_df
+                            state.dfs["doctors"] = _append_rows(docs_df, [{
+                                "doctor_id": doc_id,
+                                "name": doc_name,
+                                "max_sessions": str(int(doc_max)),
+                                "unavailable_dates": doc_unavail,
+                                "available_dates": "",
+                                "home_dates": "",
+                                "skills": doc_skills,
+                            }])
                             st.success(f"Arts opgeslagen: {doc_name or doc_id}")
                             _autosave()
                         else:
@@ -1166,16 +1526,14 @@ else:
             up_docs = st.file_uploader("Bestand artsen", type=["csv","xlsx"], key="bulk_docs_file_v2")
             if st.button("Importeer artsen", disabled=up_docs is None, key="btn_import_docs_v2"):
                 try:
-                    if up_docs.name.lower().endswith(".xlsx"):
-                        df_new = pd.read_excel(up_docs, dtype=str).fillna("")
-                    else:
-                        df_new = pd.read_csv(up_docs, dtype=str).fillna("")
+                    df_new = _read_upload(up_docs)
                     req = ["doctor_id","name","max_sessions","unavailable_dates","skills"]
                     miss = [c for c in req if c not in df_new.columns]
                     if miss:
                         raise ValueError(f"Ontbrekende kolommen: {miss}")
                     df_new = df_new[req]
-                    docs_df = state.dfs["doctors"].copy()
+                    _flush_date_sets()
+                    docs_df = state.dfs["doctors"]
                     merged = pd.concat([docs_df, df_new], ignore_index=True)
                     merged = merged.drop_duplicates(subset=["doctor_id"], keep="last")
                     state.dfs["doctors"] = merged
@@ -1185,41 +1543,48 @@ else:
                     st.error(f"Import artsen mislukt: {e}")
         with right:
             st.markdown("Bewerk arts-informatie")
-            docs_df = state.dfs["doctors"].copy()
-            for _, drow in docs_df.sort_values(["name","doctor_id"]).iterrows():
-                did = str(drow["doctor_id"]).strip()
-                dname = str(drow["name"]).strip() or did
-                with st.expander(f"{dname} ({did})", expanded=False):
+            for drow in _doctors_sorted().itertuples(index=False, name="Doc"):
+                did = str(drow.doctor_id).strip()
+                dname = str(drow.name).strip() or did
+                # Een ingeklapte expander voert zijn inhoud toch uit (±60 widgets per arts);
+                # daarom alleen renderen voor artsen die expliciet zijn opengezet. De open-status
+                # staat ook los in state, zodat hij een vroegtijdige rerun (tegelklik) overleeft.
+                if "open_doctors" not in state:
+                    state.open_doctors = set()
+                if not st.toggle(f"{dname} ({did})", value=(did in state.open_doctors), key=f"open_{did}"):
+                    state.open_doctors.discard(did)
+                    continue
+                state.open_doctors.add(did)
+                with st.container(border=True):
+                    # Het formulier toont de datums als tekst: alleen de gewijzigde sets van deze arts terugzetten
+                    _flush_date_sets(did)
+                    drow_dates = state.dfs["doctors"].loc[_doctor_row_index()[did]]
                     with st.form(f"edit_doc_{did}"):
-                        e_name = st.text_input("name", value=str(drow.get("name","")))
-                        e_max = st.text_input("max_sessions", value=str(drow.get("max_sessions","")))
-                        e_unavail = st.text_input("unavailable_dates", value=str(drow.get("unavailable_dates","")))
-                        e_avail = st.text_input("available_dates", value=str(drow.get("available_dates","")))
-                        e_skills = st.text_input("skills", value=str(drow.get("skills","")))
+                        e_name = st.text_input("name", value=str(getattr(drow, "name", "")))
+                        e_max = st.text_input("max_sessions", value=str(getattr(drow, "max_sessions", "")))
+                        e_unavail = st.text_input("unavailable_dates", value=str(drow_dates.get("unavailable_dates", "")))
+                        e_avail = st.text_input("available_dates", value=str(drow_dates.get("available_dates", "")))
+                        e_skills = st.text_input("skills", value=str(getattr(drow, "skills", "")))
                         if st.form_submit_button("Opslaan"):
-                            docs2 = state.dfs["doctors"].copy()
-                            idxs = docs2.index[docs2["doctor_id"].astype(str).str.strip() == did].tolist()
-                            if idxs:
-                                i = idxs[0]
-                                # validatie max_sessions
-                                try:
-                                    _ = int(str(e_max).strip()) if str(e_max).strip() != "" else 0
-                                except Exception:
-                                    st.error("max_sessions moet een geheel getal zijn.")
-                                docs2.at[i,"name"] = e_name
-                                docs2.at[i,"max_sessions"] = str(e_max).strip()
-                                docs2.at[i,"unavailable_dates"] = e_unavail
-                                docs2.at[i,"available_dates"] = e_avail
-                                docs2.at[i,"skills"] = e_skills
-                                state.dfs["doctors"] = docs2
+                            # validatie max_sessions
+                            try:
+                                _ = int(str(e_max).strip()) if str(e_max).strip() != "" else 0
+                            except Exception:
+                                st.error("max_sessions moet een geheel getal zijn.")
+                            if _update_doctor(
+                                did,
+                                name=e_name,
+                                max_sessions=str(e_max).strip(),
+                                unavailable_dates=e_unavail,
+                                available_dates=e_avail,
+                                skills=e_skills,
+                            ):
                                 _autosave()
                                 st.success("Arts bijgewerkt.")
 
                     # Standaard werkdagen (ma–zo) per arts
                     st.caption("Standaard werkdagen (ma–zo)")
-                    wd_tbl = state.dfs["doctor_workdays"]
-                    wd_series = wd_tbl[wd_tbl["doctor_id"].astype(str).str.strip() == did]["weekday"]
-                    current_wd = set([v for v in ( _wd_to_int(x) for x in wd_series.tolist() ) if v is not None])
+                    current_wd = _workdays_by_doctor().get(did, set())
                     day_labels = ["ma","di","wo","do","vr","za","zo"]
                     day_vals = [1,2,3,4,5,6,7]
                     cols_days = st.columns(7)
@@ -1230,233 +1595,125 @@ else:
                     with col_actions[0]:
                         if st.button("Ma–vr", key=f"wd_btn_wd_{did}"):
                             new_set = {1,2,3,4,5}
-                            df2 = state.dfs["doctor_workdays"].copy()
+                            df2 = state.dfs["doctor_workdays"]
                             df2 = df2[df2["doctor_id"].astype(str).str.strip() != did]
-                            for v in new_set:
-                                df2.loc[len(df2)] = [did, v]
-                            state.dfs["doctor_workdays"] = df2
+                            state.dfs["doctor_workdays"] = _append_rows(df2, [[did, v] for v in sorted(new_set)])
                             _autosave()
                             st.success("Vaste werkdagen ingesteld: ma–vr.")
                     with col_actions[1]:
                         if st.button("Alle dagen", key=f"wd_btn_all_{did}"):
                             new_set = {1,2,3,4,5,6,7}
-                            df2 = state.dfs["doctor_workdays"].copy()
+                            df2 = state.dfs["doctor_workdays"]
                             df2 = df2[df2["doctor_id"].astype(str).str.strip() != did]
-                            for v in new_set:
-                                df2.loc[len(df2)] = [did, v]
-                            state.dfs["doctor_workdays"] = df2
+                            state.dfs["doctor_workdays"] = _append_rows(df2, [[did, v] for v in sorted(new_set)])
                             _autosave()
                             st.success("Vaste werkdagen ingesteld: alle dagen.")
                     with col_actions[2]:
                         if st.button("Geen", key=f"wd_btn_none_{did}"):
-                            df2 = state.dfs["doctor_workdays"].copy()
+                            df2 = state.dfs["doctor_workdays"]
                             df2 = df2[df2["doctor_id"].astype(str).str.strip() != did]
                             state.dfs["doctor_workdays"] = df2
                             _autosave()
                             st.success("Vaste werkdagen gewist.")
                     if st.button("Opslaan werkdagen", key=f"wd_save_{did}"):
                         new_set = {val for val, flag in chosen.items() if flag}
-                        df2 = state.dfs["doctor_workdays"].copy()
+                        df2 = state.dfs["doctor_workdays"]
                         df2 = df2[df2["doctor_id"].astype(str).str.strip() != did]
-                        for v in sorted(new_set):
-                            df2.loc[len(df2)] = [did, v]
-                        state.dfs["doctor_workdays"] = df2
+                        state.dfs["doctor_workdays"] = _append_rows(df2, [[did, v] for v in sorted(new_set)])
                         _autosave()
                         st.success("Vaste werkdagen opgeslagen.")
 
                     # Mini-kalender voor onbeschikbare dagen
                     st.caption("Onbeschikbare dagen (mini-kalender)")
 
-                    def _parse_date_list(value: str) -> set[date]:
-                        vals = set()
-                        for part in str(value or "").split(";"):
-                            p = part.strip()
-                            if not p:
-                                continue
-                            try:
-                                vals.add(datetime.strptime(p, "%Y-%m-%d").date())
-                            except Exception:
-                                continue
-                        return vals
-
-                    def _serialize_dates(values: set[date]) -> str:
-                        return ";".join(sorted(d.isoformat() for d in values))
-
-                    current_unavail = _parse_date_list(drow.get("unavailable_dates",""))
-                    current_avail = _parse_date_list(drow.get("available_dates",""))
-                    # home_dates kan ontbreken; vang dat af
-                    current_home = _parse_date_list(drow.get("home_dates",""))
-                    mode = st.radio("Kalender modus", ["Onbeschikbaar", "Beschikbaar (uitzondering)", "Thuiswerk"], horizontal=True, key=f"cal_mode_{did}")
-                    is_unavail_mode = mode.startswith("Onbeschik")
-                    is_avail_mode = mode.startswith("Beschikbaar")
-                    is_home_mode = mode.startswith("Thuis")
+                    # Kopieën: de handlers hieronder wijzigen deze sets
+                    date_sets = _doctor_date_sets()
+                    current_unavail = set(date_sets["unavailable_dates"].get(did, ()))
+                    current_avail = set(date_sets["available_dates"].get(did, ()))
+                    # home_dates kan ontbreken; levert dan een lege set
+                    current_home = set(date_sets["home_dates"].get(did, ()))
+                    cal_mode = st.radio("Kalender modus", ["Onbeschikbaar", "Beschikbaar (uitzondering)", "Thuiswerk"], horizontal=True, key=f"cal_mode_{did}")
+                    is_unavail_mode = cal_mode.startswith("Onbeschik")
+                    is_avail_mode = cal_mode.startswith("Beschikbaar")
+                    is_home_mode = cal_mode.startswith("Thuis")
                     pick_month = st.date_input("Kies maand", value=date.today().replace(day=1), key=f"unav_month_{did}")
                     month_start = date(pick_month.year, pick_month.month, 1)
-                    # bepaal alle dagen van de maand
-                    if pick_month.month == 12:
-                        next_month = date(pick_month.year + 1, 1, 1)
-                    else:
-                        next_month = date(pick_month.year, pick_month.month + 1, 1)
-                    days = []
-                    dcur = month_start
-                    while dcur < next_month:
-                        days.append(dcur)
-                        dcur = dcur + timedelta(days=1)
-
-                    # render grid: 7 kolommen (ma..zo) met gekleurde tegels
-                    st.caption("Legenda: 🟥 onbeschikbaar  🟩 beschikbaar  🟦 thuiswerk  ⬜ geen")
-                    weekday_labels = ["ma","di","wo","do","vr","za","zo"]
-                    cols = st.columns(7)
-                    for idx, label in enumerate(weekday_labels):
-                        cols[idx].markdown(f"**{label.upper()}**")
+                    # alle dagen van de maand + uitlijning op weekdag (gecachet per maand)
+                    days, first_wd, total_rows = _month_days(pick_month.year, pick_month.month)
 
                     # vaste werkdagen van de arts om standaard groen te tonen
-                    wd_series2 = state.dfs["doctor_workdays"][state.dfs["doctor_workdays"]["doctor_id"].astype(str).str.strip() == did]["weekday"]
-                    person_wd = set([v for v in (_wd_to_int(x) for x in wd_series2.tolist()) if v is not None])
-
-                    first_wd = (month_start.weekday() + 1)  # Monday=0 -> 1..7
-                    from math import ceil
-                    total_slots = ((first_wd - 1) + len(days))
-                    total_rows = ceil(total_slots / 7)
-                    index = 0
-                    toggled_clicked = False
-                    for r in range(total_rows):
-                        cols_r = st.columns(7)
-                        for c in range(7):
-                            slot = r * 7 + c
-                            if slot < (first_wd - 1) or index >= len(days):
-                                cols_r[c].markdown(" ")
-                            else:
-                                dte = days[index]
-                                index += 1
-                                # Bepaal ico op basis van setjes en vaste werkdagen
-                                if dte in current_unavail:
-                                    ico = "🟥"
-                                elif dte in current_home:
-                                    ico = "🟦"
-                                else:
-                                    wd_num = int(dte.weekday()) + 1
-                                    if dte in current_avail or wd_num in person_wd:
-                                        ico = "🟩"
-                                    else:
-                                        ico = "⬜"
-                                key = f"daybtn_{did}_{dte.isoformat()}"
-                                if cols_r[c].button(f"{ico} {dte.day:02d}", key=key):
-                                    toggled_clicked = True
-                                    # Toggle volgens modus
-                                    if is_unavail_mode:
-                                        if dte in current_unavail:
-                                            current_unavail.remove(dte)
-                                        else:
-                                            current_unavail.add(dte)
-                                            # rood overschrijft anderen
-                                            current_avail.discard(dte)
-                                            current_home.discard(dte)
-                                    elif is_avail_mode:
-                                        if dte in current_avail:
-                                            current_avail.remove(dte)
-                                        else:
-                                            current_avail.add(dte)
-                                            current_unavail.discard(dte)
-                                    elif is_home_mode:
-                                        if dte in current_home:
-                                            current_home.remove(dte)
-                                        else:
-                                            current_home.add(dte)
-                                            current_unavail.discard(dte)
-                    # Sla directe toggles meteen op en herlaad, zodat kleur direct ververst
-                    if toggled_clicked:
-                        docs2 = state.dfs["doctors"].copy()
-                        idxs = docs2.index[docs2["doctor_id"].astype(str).str.strip() == did].tolist()
-                        if idxs:
-                            i = idxs[0]
-                            docs2.at[i, "unavailable_dates"] = ";".join(sorted(d.isoformat() for d in current_unavail))
-                            docs2.at[i, "available_dates"] = ";".join(sorted(d.isoformat() for d in current_avail))
-                            if "home_dates" in docs2.columns:
-                                docs2.at[i, "home_dates"] = ";".join(sorted(d.isoformat() for d in current_home))
-                            state.dfs["doctors"] = docs2
-                            _autosave()
-                            _safe_rerun()
+                    person_wd = _workdays_by_doctor().get(did, set())
+
+                    # Overzicht in kleur (alleen-lezen) en één bewerkbaar raster met vinkjes voor de
+                    # actieve modus, i.p.v. ~42 losse knoppen die elk een widget per rerun kosten.
+                    st.caption("Legenda: 🟥 onbeschikbaar  🟩 beschikbaar  🟦 thuiswerk  ⬜ geen")
+                    # Maandstatus als bitmaskers (bit i = dag i+1): één opzoekronde per set, daarna shift-and-mask
+                    u_mask = _month_mask(days, current_unavail)
+                    a_mask = _month_mask(days, current_avail)
+                    h_mask = _month_mask(days, current_home)
+                    wd_mask = sum(1 << i for i, dte in enumerate(days) if dte.weekday() + 1 in person_wd)
+                    green_mask = a_mask | wd_mask
+                    cells = [[""] * 7 for _ in range(total_rows)]
+                    for idx, dte in enumerate(days):
+                        if (u_mask >> idx) & 1:
+                            ico = "🟥"
+                        elif (h_mask >> idx) & 1:
+                            ico = "🟦"
+                        elif (green_mask >> idx) & 1:
+                            ico = "🟩"
+                        else:
+                            ico = "⬜"
+                        slot = idx + first_wd - 1
+                        cells[slot // 7][slot % 7] = f"{ico} {dte.day:02d}"
+                    st.dataframe(
+                        pd.DataFrame(cells, columns=[label.upper() for label in _WEEKDAY_LABELS]),
+                        hide_index=True,
+                        use_container_width=True,
+                    )
+
+                    marked = u_mask if is_unavail_mode else h_mask if is_home_mode else a_mask
+                    grid_key = f"cal_{did}_{state.get(f'cal_ver_{did}', 0)}"
+                    st.caption(f"Vink dagen aan/uit voor: {cal_mode}")
+                    st.data_editor(
+                        _calendar_grid(pick_month.year, pick_month.month, marked),
+                        key=grid_key,
+                        use_container_width=True,
+                        on_change=_apply_calendar_edits,
+                        args=(did, grid_key, pick_month.year, pick_month.month),
+                    )
 
+                    # Maand-/bereikacties: één set-bewerking op de set van de actieve modus, één keer wegschrijven
+                    col = "unavailable_dates" if is_unavail_mode else "available_dates"
+                    base_set = current_unavail if is_unavail_mode else current_avail
+                    month_set = set(days)
+                    new_set: Optional[Set[date]] = None
+                    msg = ""
                     act1, act2, act3, act4 = st.columns(4)
                     with act1:
                         if st.button("Selecteer werkdagen", key=f"sel_wd_{did}"):
-                            base_set = current_unavail if is_unavail_mode else current_avail
-                            month_set = {d for d in base_set if not (d.year == month_start.year and d.month == month_start.month)}
-                            for dte in days:
-                                if dte.weekday() < 5:  # ma-vr
-                                    month_set.add(dte)
-                            docs2 = state.dfs["doctors"].copy()
-                            idxs = docs2.index[docs2["doctor_id"].astype(str).str.strip() == did].tolist()
-                            if idxs:
-                                i = idxs[0]
-                                col = "unavailable_dates" if is_unavail_mode else "available_dates"
-                                docs2.at[i, col] = _serialize_dates(month_set)
-                                state.dfs["doctors"] = docs2
-                                _autosave()
-                                st.success("Werkdagen geselecteerd voor deze maand.")
+                            new_set = (base_set - month_set) | {d for d in days if d.weekday() < 5}  # ma-vr
+                            msg = "Werkdagen geselecteerd voor deze maand."
                     with act2:
                         if st.button("Wis maand", key=f"clear_month_{did}"):
-                            base_set = current_unavail if is_unavail_mode else current_avail
-                            month_set = {d for d in base_set if not (d.year == month_start.year and d.month == month_start.month)}
-                            docs2 = state.dfs["doctors"].copy()
-                            idxs = docs2.index[docs2["doctor_id"].astype(str).str.strip() == did].tolist()
-                            if idxs:
-                                i = idxs[0]
-                                col = "unavailable_dates" if is_unavail_mode else "available_dates"
-                                docs2.at[i, col] = _serialize_dates(month_set)
-                                state.dfs["doctors"] = docs2
-                                _autosave()
-                                st.success("Maand gewist.")
+                            new_set = base_set - month_set
+                            msg = "Maand gewist."
                     with act3:
                         vac_start = st.date_input("2 weken vanaf", value=month_start, key=f"vac2_start_{did}")
                         if st.button("Markeer 2 weken", key=f"vac2_btn_{did}"):
-                            new_set = set(current_unavail if is_unavail_mode else current_avail)
-                            for i in range(14):
-                                new_set.add(vac_start + timedelta(days=i))
-                            docs2 = state.dfs["doctors"].copy()
-                            idxs = docs2.index[docs2["doctor_id"].astype(str).str.strip() == did].tolist()
-                            if idxs:
-                                i = idxs[0]
-                                col = "unavailable_dates" if is_unavail_mode else "available_dates"
-                                docs2.at[i, col] = _serialize_dates(new_set)
-                                state.dfs["doctors"] = docs2
-                                _autosave()
-                                st.success("2 weken vakantie gemarkeerd.")
+                            new_set = base_set | {vac_start + timedelta(days=i) for i in range(14)}
+                            msg = "2 weken vakantie gemarkeerd."
                     with act4:
                         r1 = st.date_input("Bereik van", value=month_start, key=f"rng_from_{did}")
                         r2 = st.date_input("t/m", value=month_start + timedelta(days=6), key=f"rng_to_{did}")
-                        if st.button("Markeer bereik", key=f"rng_mark_{did}"):
-                            new_set = set(current_unavail if is_unavail_mode else current_avail)
-                            dcur = r1
-                            while dcur <= r2:
-                                new_set.add(dcur)
-                                dcur = dcur + timedelta(days=1)
-                            docs2 = state.dfs["doctors"].copy()
-                            idxs = docs2.index[docs2["doctor_id"].astype(str).str.strip() == did].tolist()
-                            if idxs:
-                                i = idxs[0]
-                                col = "unavailable_dates" if is_unavail_mode else "available_dates"
-                                docs2.at[i, col] = _serialize_dates(new_set)
-                                state.dfs["doctors"] = docs2
-                                _autosave()
-                                st.success("Bereik gemarkeerd.")
-                        if st.button("Wis bereik", key=f"rng_clear_{did}"):
-                            new_set = set(current_unavail if is_unavail_mode else current_avail)
-                            dcur = r1
-                            while dcur <= r2:
-                                if dcur in new_set:
-                                    new_set.remove(dcur)
-                                dcur = dcur + timedelta(days=1)
-                            docs2 = state.dfs["doctors"].copy()
-                            idxs = docs2.index[docs2["doctor_id"].astype(str).str.strip() == did].tolist()
-                            if idxs:
-                                i = idxs[0]
-                                col = "unavailable_dates" if is_unavail_mode else "available_dates"
-                                docs2.at[i, col] = _serialize_dates(new_set)
-                                state.dfs["doctors"] = docs2
-                                _autosave()
-                                st.success("Bereik gewist.")
+                        rng_mark = st.button("Markeer bereik", key=f"rng_mark_{did}")
+                        rng_clear = st.button("Wis bereik", key=f"rng_clear_{did}")
+                        if rng_mark or rng_clear:
+                            # bereik alleen opbouwen bij een klik, in één C-level range
+                            range_set = set(pd.date_range(r1, r2, freq="D").date)
+                            new_set = base_set | range_set if rng_mark else base_set - range_set
+                            msg = "Bereik gemarkeerd." if rng_mark else "Bereik gewist."
+                    if new_set is not None and _write_dateset(did, col, new_set):
+                        st.success(msg)
 
                     # Jaar-acties voor beschikbaarheid (per persoon)
                     st.caption("Jaaracties")
@@ -1464,47 +1721,16 @@ else:
                     scope = st.radio("Dagen", ["Vaste werkdagen", "Alle dagen"], horizontal=True, key=f"year_scope_{did}")
                     if st.button("Zet beschikbaar in jaar", key=f"year_set_avail_{did}"):
                         # Alleen in beschikbaarheidsmodus heeft dit effect
-                        base_set = set(current_avail)
-                        # bepaal alle datums in jaar
-                        start = date(int(year), 1, 1)
-                        end = date(int(year), 12, 31)
-                        dcur = start
-                        wd_set = state.dfs["doctor_workdays"]
-                        wd_series2 = wd_set[wd_set["doctor_id"].astype(str).str.strip() == did]["weekday"]
-                        person_wd = set([v for v in (_wd_to_int(x) for x in wd_series2.tolist()) if v is not None])
-                        while dcur <= end:
-                            ok = True
-                            if scope.startswith("Vaste"):
-                                # alleen vaste werkdagen aanzetten
-                                w = int(dcur.weekday()) + 1
-                                ok = (w in person_wd)
-                            if ok:
-                                base_set.add(dcur)
-                            dcur = dcur + timedelta(days=1)
-                        docs2 = state.dfs["doctors"].copy()
-                        idxs = docs2.index[docs2["doctor_id"].astype(str).str.strip() == did].tolist()
-                        if idxs:
-                            i = idxs[0]
-                            docs2.at[i, "available_dates"] = ";".join(sorted(d.isoformat() for d in base_set))
-                            state.dfs["doctors"] = docs2
-                            _autosave()
+                        # alle datums in jaar, gevectoriseerd gefilterd op weekdag
+                        rng = pd.date_range(date(int(year), 1, 1), date(int(year), 12, 31), freq="D")
+                        if scope.startswith("Vaste"):
+                            # alleen vaste werkdagen aanzetten
+                            rng = rng[rng.weekday.isin([w - 1 for w in person_wd])]
+                        if _write_dateset(did, "available_dates", current_avail | set(rng.date)):
                             st.success("Jaar-beschikbaarheid gezet.")
                     if st.button("Wis beschikbaar in jaar", key=f"year_clear_avail_{did}"):
-                        base_set = set(current_avail)
-                        start = date(int(year), 1, 1)
-                        end = date(int(year), 12, 31)
-                        dcur = start
-                        while dcur <= end:
-                            if dcur in base_set:
-                                base_set.remove(dcur)
-                            dcur = dcur + timedelta(days=1)
-                        docs2 = state.dfs["doctors"].copy()
-                        idxs = docs2.index[docs2["doctor_id"].astype(str).str.strip() == did].tolist()
-                        if idxs:
-                            i = idxs[0]
-                            docs2.at[i, "available_dates"] = ";".join(sorted(d.isoformat() for d in base_set))
-                            state.dfs["doctors"] = docs2
-                            _autosave()
+                        year_days = set(pd.date_range(date(int(year), 1, 1), date(int(year), 12, 31), freq="D").date)
+                        if _write_dateset(did, "available_dates", current_avail - year_days):
                             st.success("Jaar-beschikbaarheid gewist.")
 
                     # Opslaan-knop is niet meer nodig; clicks slaan direct op
@@ -1533,37 +1759,38 @@ else:
             wd_overwrite_all = st.checkbox("Bestaande werkdagen overschrijven voor dokters in bestand", value=False, key="bulk_wd_overwrite_v2")
             if st.button("Importeer werkdagen", disabled=up_wd is None, key="btn_import_wd_v2"):
                 try:
-                    if up_wd.name.lower().endswith(".xlsx"):
-                        df_new = pd.read_excel(up_wd, dtype=str).fillna("")
-                    else:
-                        df_new = pd.read_csv(up_wd, dtype=str).fillna("")
+                    df_new = _read_upload(up_wd)
                     req = ["doctor_id","weekday"]
                     miss = [c for c in req if c not in df_new.columns]
                     if miss:
                         raise ValueError(f"Ontbrekende kolommen: {miss}")
                     # normaliseer weekday
-                    df_new["weekday"] = df_new["weekday"].apply(lambda v: _wd_to_int(v))
+                    df_new["weekday"] = _wd_series_to_int(df_new["weekday"])
                     df_new = df_new.dropna(subset=["weekday"])
-                    wd_df = state.dfs["doctor_workdays"].copy()
+                    df_new["weekday"] = df_new["weekday"].astype(int)
+                    wd_df = state.dfs["doctor_workdays"]
                     if wd_overwrite_all:
                         to_clear = set(df_new["doctor_id"].astype(str).str.strip())
                         wd_df = wd_df[~wd_df["doctor_id"].astype(str).str.strip().isin(to_clear)]
-                    merged = pd.concat([wd_df, df_new[req]], ignore_index=True)
-                    merged = merged.drop_duplicates(subset=["doctor_id","weekday"], keep="last")
-                    state.dfs["doctor_workdays"] = merged
+                    # Alleen bestaande (arts, weekdag)-paren weglaten die het bestand opnieuw aanlevert;
+                    # geen duplicaatscan over de volledig samengevoegde tabel.
+                    df_new["doctor_id"] = df_new["doctor_id"].astype(str).str.strip()
+                    df_new = df_new[req].drop_duplicates()
+                    new_keys = set(zip(df_new["doctor_id"], df_new["weekday"]))
+                    existing_keys = zip(wd_df["doctor_id"].astype(str).str.strip(), _wd_series_to_int(wd_df["weekday"]))
+                    keep = [(d, w) not in new_keys for d, w in existing_keys]
+                    state.dfs["doctor_workdays"] = pd.concat([wd_df[keep], df_new], ignore_index=True)
                     st.success(f"Werkdagen geïmporteerd: {len(df_new)} rijen.")
                     _autosave()
                 except Exception as e:
                     st.error(f"Import werkdagen mislukt: {e}")
         with right2:
             st.markdown("Bewerk werkdagen per arts")
-            docs_df = state.dfs["doctors"].copy()
-            wd_df = state.dfs["doctor_workdays"].copy()
-            for _, drow in docs_df.sort_values(["name", "doctor_id"]).iterrows():
-                did = str(drow["doctor_id"]).strip()
-                dname = str(drow["name"]).strip() or did
-                rows = wd_df[wd_df["doctor_id"].astype(str).str.strip() == did]["weekday"].tolist()
-                curr_wd = set([v for v in (_wd_to_int(x) for x in rows) if v is not None])
+            wd_by_doc = _workdays_by_doctor()
+            for drow in _doctors_sorted().itertuples(index=False, name="Doc"):
+                did = str(drow.doctor_id).strip()
+                dname = str(drow.name).strip() or did
+                curr_wd = wd_by_doc.get(did, set())
                 with st.expander(f"{dname} ({did})", expanded=False):
                     st.caption("Wijzig werkdagen")
                     cc1, cc2, cc3, cc4, cc5, cc6, cc7 = st.columns(7)
@@ -1583,11 +1810,9 @@ else:
                         if vr2: new_set.add(5)
                         if za2: new_set.add(6)
                         if zo2: new_set.add(7)
-                        wd_df2 = state.dfs["doctor_workdays"].copy()
+                        wd_df2 = state.dfs["doctor_workdays"]
                         wd_df2 = wd_df2[wd_df2["doctor_id"].astype(str).str.strip() != did]
-                        for d in sorted(new_set):
-                            wd_df2.loc[len(wd_df2)] = [did, d]
-                        state.dfs["doctor_workdays"] = wd_df2
+                        state.dfs["doctor_workdays"] = _append_rows(wd_df2, [[did, d] for d in sorted(new_set)])
                         _autosave()
                         st.success("Werkdagen opgeslagen.")
 
@@ -1595,6 +1820,7 @@ st.subheader("Opslaan/Exporteren")
 col_save1, col_save2 = st.columns(2)
 with col_save1:
     if st.button("Opslaan naar CSV's (data/custom)"):
+        _autosave(force=True)
         out_dir = Path("data/custom")
         out_dir.mkdir(parents=True, exist_ok=True)
         name_map = {
@@ -1615,28 +1841,12 @@ with col_save2:
         out_dir = Path("data/custom")
         out_dir.mkdir(parents=True, exist_ok=True)
         xlsx_path = out_dir / "megaplanner_data.xlsx"
-        with pd.ExcelWriter(xlsx_path, engine="openpyxl") as writer:
-            state.dfs["doctors"].to_excel(writer, index=False, sheet_name="Doctors")
-            state.dfs["locations"].to_excel(writer, index=False, sheet_name="Locations")
-            state.dfs["rooms"].to_excel(writer, index=False, sheet_name="Rooms")
-            state.dfs["sessions"].to_excel(writer, index=False, sheet_name="Sessions")
-            state.dfs["preferences"].to_excel(writer, index=False, sheet_name="Preferences")
-            state.dfs["travel_times"].to_excel(writer, index=False, sheet_name="TravelTimes")
-            state.dfs["doctor_workdays"].to_excel(writer, index=False, sheet_name="DoctorWorkdays")
-            state.dfs["doctor_week_rules"].to_excel(writer, index=False, sheet_name="DoctorWeekRules")
+        _flush_date_sets()
+        # Eén keer serialiseren; dezelfde bytes gaan naar schijf en naar de download
+        xlsx_bytes = _workbook_bytes(state.dfs)
+        xlsx_path.write_bytes(xlsx_bytes)
         st.success(f"Excel opgeslagen: {xlsx_path}")
-        # Geef ook directe download
-        buf = io.BytesIO()
-        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-            state.dfs["doctors"].to_excel(writer, index=False, sheet_name="Doctors")
-            state.dfs["locations"].to_excel(writer, index=False, sheet_name="Locations")
-            state.dfs["rooms"].to_excel(writer, index=False, sheet_name="Rooms")
-            state.dfs["sessions"].to_excel(writer, index=False, sheet_name="Sessions")
-            state.dfs["preferences"].to_excel(writer, index=False, sheet_name="Preferences")
-            state.dfs["travel_times"].to_excel(writer, index=False, sheet_name="TravelTimes")
-            state.dfs["doctor_workdays"].to_excel(writer, index=False, sheet_name="DoctorWorkdays")
-            state.dfs["doctor_week_rules"].to_excel(writer, index=False, sheet_name="DoctorWeekRules")
-        st.download_button("Download Excel nu", data=buf.getvalue(), file_name="megaplanner_data.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        st.download_button("Download Excel nu", data=xlsx_bytes, file_name="megaplanner_data.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 
 
@@ -1648,118 +1858,141 @@ st.caption("Tip: gebruik weekregels en vaste werkdagen om snel sessies voor de r
 
 
 
-st.subheader("Controleer data")
-if st.button("Controleer data (validatie)"):
+# Formaatchecks voor de validatie: een regex-match per kolom i.p.v. strptime met try/except per cel.
+# Zelfde acceptatie als strptime("%H:%M") / ("%Y-%m-%d"), dus ook "7:05" en "2025-3-1".
+_HHMM = re.compile(r"^(?:[01]?[0-9]|2[0-3]):[0-5]?[0-9]$")
+_YMD = re.compile(r"^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}$")
+# Gehele getallen: alleen ASCII-cijfers, zodat alles wat hier doorkomt ook door int() komt
+_UINT_RE = re.compile(r"^[0-9]+$")
+_INT_RE = re.compile(r"^-?[0-9]+$")
+
+
+@st.cache_data(show_spinner=False)
+def _validate(
+    doctors: pd.DataFrame,
+    locations: pd.DataFrame,
+    sessions: pd.DataFrame,
+    preferences: pd.DataFrame,
+    travel_times: pd.DataFrame,
+    doctor_workdays: pd.DataFrame,
+    doctor_week_rules: pd.DataFrame,
+) -> pd.DataFrame:
+    """Validatiefouten als DataFrame (table, row, error); gecachet op de inhoud van de tabellen."""
     errors: List[Dict[str, str]] = []
+    dfs = {
+        "doctors": doctors,
+        "locations": locations,
+        "sessions": sessions,
+        "preferences": preferences,
+        "travel_times": travel_times,
+        "doctor_workdays": doctor_workdays,
+        "doctor_week_rules": doctor_week_rules,
+    }
 
-    def is_hhmm(s: str) -> bool:
-        try:
-            _ = datetime.strptime(s, "%H:%M")
-            return True
-        except Exception:
-            return False
+    # Alle checks werken kolomgewijs; per check worden alleen de foute rijen doorlopen.
+    def col(table: str, name: str) -> pd.Series:
+        df = dfs[table]
+        if name not in df.columns:
+            return pd.Series("", index=df.index, dtype=object)
+        return df[name].astype(str).str.strip()
+
+    def add(table: str, bad: pd.Series, error) -> None:
+        """error: vaste tekst, of een Series met de tekst per rij."""
+        positions = bad.to_numpy().nonzero()[0]
+        for pos, idx in zip(positions, bad.index[positions]):
+            msg = error if isinstance(error, str) else error.iat[pos]
+            errors.append({"table": table, "row": str(idx), "error": msg, "_pos": pos})
+
+    def not_hhmm(values: pd.Series) -> pd.Series:
+        return ~values.str.match(_HHMM)
+
+    def not_ymd(values: pd.Series) -> pd.Series:
+        # regex voor de vorm; alleen wat daar doorheen komt gaat door to_datetime (bestaat de datum?)
+        ok = values.str.match(_YMD)
+        ok[ok] = pd.to_datetime(values[ok], format="%Y-%m-%d", errors="coerce").notna().to_numpy()
+        return ~ok
+
+    def dup_or_missing(table: str, key: str) -> pd.Series:
+        ids = col(table, key)
+        add(table, ids == "", f"{key} ontbreekt")
+        add(table, (ids != "") & ids.duplicated(), f"{key} dubbel: " + ids)
+        return ids
+
+    def known_ids(ids: pd.Series) -> pd.Index:
+        # unieke niet-lege sleutels, één keer bepaald en hergebruikt door alle FK-checks
+        return pd.Index(ids[ids != ""].unique())
 
     # Doctors
-    doc_ids = set()
-    for idx, r in state.dfs["doctors"].iterrows():
-        did = str(r["doctor_id"]).strip()
-        if not did:
-            errors.append({"table": "doctors", "row": str(idx), "error": "doctor_id ontbreekt"})
-        elif did in doc_ids:
-            errors.append({"table": "doctors", "row": str(idx), "error": f"doctor_id dubbel: {did}"})
-        doc_ids.add(did)
-        ms = str(r["max_sessions"]).strip()
-        if ms and not ms.isdigit():
-            errors.append({"table": "doctors", "row": str(idx), "error": "max_sessions moet geheel getal zijn"})
+    doc_ids = known_ids(dup_or_missing("doctors", "doctor_id"))
+    ms = col("doctors", "max_sessions")
+    add("doctors", (ms != "") & ~ms.str.match(_UINT_RE), "max_sessions moet geheel getal zijn")
 
     # Locations
-    loc_ids = set()
-    for idx, r in state.dfs["locations"].iterrows():
-        lid = str(r["location_id"]).strip()
-        if not lid:
-            errors.append({"table": "locations", "row": str(idx), "error": "location_id ontbreekt"})
-        elif lid in loc_ids:
-            errors.append({"table": "locations", "row": str(idx), "error": f"location_id dubbel: {lid}"})
-        loc_ids.add(lid)
-        dst = str(r.get("default_start_time", "")).strip()
-        det = str(r.get("default_end_time", "")).strip()
-        if dst and not is_hhmm(dst):
-            errors.append({"table": "locations", "row": str(idx), "error": "default_start_time geen HH:MM"})
-        if det and not is_hhmm(det):
-            errors.append({"table": "locations", "row": str(idx), "error": "default_end_time geen HH:MM"})
+    loc_ids = known_ids(dup_or_missing("locations", "location_id"))
+    for name in ("default_start_time", "default_end_time"):
+        t = col("locations", name)
+        add("locations", (t != "") & not_hhmm(t), f"{name} geen HH:MM")
 
     # Sessions
-    sess_ids = set()
-    for idx, r in state.dfs["sessions"].iterrows():
-        sid = str(r["session_id"]).strip()
-        if not sid:
-            errors.append({"table": "sessions", "row": str(idx), "error": "session_id ontbreekt"})
-        elif sid in sess_ids:
-            errors.append({"table": "sessions", "row": str(idx), "error": f"session_id dubbel: {sid}"})
-        sess_ids.add(sid)
-        try:
-            _ = datetime.strptime(str(r["date"]).strip(), "%Y-%m-%d")
-        except Exception:
-            errors.append({"table": "sessions", "row": str(idx), "error": "date geen YYYY-MM-DD"})
-        stime = str(r["start_time"]).strip()
-        etime = str(r["end_time"]).strip()
-        if not is_hhmm(stime):
-            errors.append({"table": "sessions", "row": str(idx), "error": "start_time geen HH:MM"})
-        if not is_hhmm(etime):
-            errors.append({"table": "sessions", "row": str(idx), "error": "end_time geen HH:MM"})
+    dup_or_missing("sessions", "session_id")
+    add("sessions", not_ymd(col("sessions", "date")), "date geen YYYY-MM-DD")
+    for name in ("start_time", "end_time"):
+        add("sessions", not_hhmm(col("sessions", name)), f"{name} geen HH:MM")
+
+    def unknown(table: str, name: str, valid: pd.Index) -> None:
+        # één isin-pass per FK-kolom tegen de vooraf bepaalde unieke sleutels
+        v = col(table, name)
+        add(table, (v != "") & ~v.isin(valid), f"{name} onbekend: " + v)
 
     # Preferences
-    for idx, r in state.dfs["preferences"].iterrows():
-        did = str(r["doctor_id"]).strip()
-        lid = str(r["location_id"]).strip()
-        sc = str(r["score"]).strip()
-        if did and did not in doc_ids:
-            errors.append({"table": "preferences", "row": str(idx), "error": f"doctor_id onbekend: {did}"})
-        if lid and lid not in loc_ids:
-            errors.append({"table": "preferences", "row": str(idx), "error": f"location_id onbekend: {lid}"})
-        if sc and not (sc.lstrip("-").isdigit()):
-            errors.append({"table": "preferences", "row": str(idx), "error": "score geen geheel getal"})
+    unknown("preferences", "doctor_id", doc_ids)
+    unknown("preferences", "location_id", loc_ids)
+    sc = col("preferences", "score")
+    add("preferences", (sc != "") & ~sc.str.match(_INT_RE), "score geen geheel getal")
 
     # Travel times
-    for idx, r in state.dfs["travel_times"].iterrows():
-        a = str(r["from_location_id"]).strip()
-        b = str(r["to_location_id"]).strip()
-        m = str(r["minutes"]).strip()
-        if a and a not in loc_ids:
-            errors.append({"table": "travel_times", "row": str(idx), "error": f"from_location_id onbekend: {a}"})
-        if b and b not in loc_ids:
-            errors.append({"table": "travel_times", "row": str(idx), "error": f"to_location_id onbekend: {b}"})
-        if m and not m.isdigit():
-            errors.append({"table": "travel_times", "row": str(idx), "error": "minutes geen geheel getal"})
+    unknown("travel_times", "from_location_id", loc_ids)
+    unknown("travel_times", "to_location_id", loc_ids)
+    m = col("travel_times", "minutes")
+    add("travel_times", (m != "") & ~m.str.match(_UINT_RE), "minutes geen geheel getal")
 
     # DoctorWorkdays
     valid_wd = {"1","2","3","4","5","6","7","ma","di","wo","do","vr","za","zo"}
-    for idx, r in state.dfs["doctor_workdays"].iterrows():
-        did = str(r["doctor_id"]).strip()
-        wd = str(r["weekday"]).strip().lower()
-        if did and did not in doc_ids:
-            errors.append({"table": "doctor_workdays", "row": str(idx), "error": f"doctor_id onbekend: {did}"})
-        if wd and wd not in valid_wd:
-            errors.append({"table": "doctor_workdays", "row": str(idx), "error": f"weekday ongeldig: {wd}"})
+
+    def bad_weekday(table: str) -> None:
+        wd = col(table, "weekday").str.lower()
+        add(table, (wd != "") & ~wd.isin(valid_wd), "weekday ongeldig: " + wd)
+
+    unknown("doctor_workdays", "doctor_id", doc_ids)
+    bad_weekday("doctor_workdays")
 
     # DoctorWeekRules
-    for idx, r in state.dfs["doctor_week_rules"].iterrows():
-        did = str(r["doctor_id"]).strip()
-        wom = str(r["week_of_month"]).strip()
-        wd = str(r["weekday"]).strip().lower()
-        lid = str(r["location_id"]).strip()
-        if did and did not in doc_ids:
-            errors.append({"table": "doctor_week_rules", "row": str(idx), "error": f"doctor_id onbekend: {did}"})
-        if lid and lid not in loc_ids:
-            errors.append({"table": "doctor_week_rules", "row": str(idx), "error": f"location_id onbekend: {lid}"})
-        if wom and (not wom.isdigit() or int(wom) < 1 or int(wom) > 5):
-            errors.append({"table": "doctor_week_rules", "row": str(idx), "error": "week_of_month niet 1..5"})
-        if wd and wd not in valid_wd:
-            errors.append({"table": "doctor_week_rules", "row": str(idx), "error": f"weekday ongeldig: {wd}"})
-
-    if errors:
-        st.error(f"{len(errors)} validatiefouten gevonden.")
-        st.dataframe(pd.DataFrame(errors), use_container_width=True)
+    unknown("doctor_week_rules", "doctor_id", doc_ids)
+    unknown("doctor_week_rules", "location_id", loc_ids)
+    wom = col("doctor_week_rules", "week_of_month")
+    wom_num = pd.to_numeric(wom.where(wom.str.match(_UINT_RE)), errors="coerce")
+    add("doctor_week_rules", (wom != "") & ~wom_num.between(1, 5), "week_of_month niet 1..5")
+    bad_weekday("doctor_week_rules")
+
+    # Zelfde volgorde als voorheen: per tabel op rij, binnen een rij in volgorde van de checks
+    table_order = {t: i for i, t in enumerate(dfs)}
+    errors.sort(key=lambda e: (table_order.get(e["table"], len(table_order)), e["_pos"]))
+    for e in errors:
+        del e["_pos"]
+    return pd.DataFrame(errors, columns=["table", "row", "error"])
+
+
+st.subheader("Controleer data")
+if st.button("Controleer data (validatie)"):
+    _flush_date_sets()
+    dfs = state.dfs
+    errors_df = _validate(
+        dfs["doctors"], dfs["locations"], dfs["sessions"], dfs["preferences"],
+        dfs["travel_times"], dfs["doctor_workdays"], dfs["doctor_week_rules"],
+    )
+    if len(errors_df):
+        st.error(f"{len(errors_df)} validatiefouten gevonden.")
+        st.dataframe(errors_df, use_container_width=True)
     else:
         st.success("Geen fouten gevonden.")
 
@@ -1771,47 +2004,63 @@ if mode == "Agenda (planning)":
         out_csv = Path("output/schedule.csv")
         if out_csv.exists():
             try:
-                state.schedule_df = pd.read_csv(out_csv, dtype=str).fillna("")
+                state.schedule_df = _load_schedule(str(out_csv), out_csv.stat().st_mtime)
             except Exception:
                 pass
     if "schedule_df" not in state or len(state.schedule_df) == 0:
         st.info("Nog geen planning beschikbaar. Maak eerst een planning of importeer `output/schedule.csv`.")
     else:
-        sched = state.schedule_df.copy()
-        # Parseer datums voor filtering
-        sched["date"] = pd.to_datetime(sched["date"], errors="coerce").dt.date
+        # Geparste datums en filteropties: één keer per planning, niet bij elke filterwijziging
+        sched, doc_options, loc_options = _agenda_data()
         # Filters
         c1, c2, c3, c4 = st.columns(4)
         with c1:
-            start_d = st.date_input("Vanaf", value=min(sched["date"]))
+            start_d = st.date_input("Vanaf", value=sched["date"].min().date())
         with c2:
-            end_d = st.date_input("Tot en met", value=max(sched["date"]))
+            end_d = st.date_input("Tot en met", value=sched["date"].max().date())
         with c3:
-            doc_options = sorted(sched["doctor_name"].unique().tolist())
             sel_docs = st.multiselect("Artsen", options=doc_options, default=doc_options)
         with c4:
-            loc_options = sorted(sched["location_id"].unique().tolist())
             sel_locs = st.multiselect("Locaties", options=loc_options, default=loc_options)
-        mask = (sched["date"] >= start_d) & (sched["date"] <= end_d) & sched["doctor_name"].isin(sel_docs) & sched["location_id"].isin(sel_locs)
+        # Eén boolean-array die in-place wordt verfijnd, i.p.v. een nieuwe array per `&`
+        mask = sched["date"].between(pd.Timestamp(start_d), pd.Timestamp(end_d)).to_numpy()
+        # Alles geselecteerd (de standaard) filtert niets: dan geen isin-pass over de hele planning
+        sel_docs_s = frozenset(sel_docs)
+        sel_locs_s = frozenset(sel_locs)
+        if len(sel_docs_s) < len(doc_options):
+            mask &= sched["doctor_name"].isin(sel_docs_s).to_numpy()
+        if len(sel_locs_s) < len(loc_options):
+            mask &= sched["location_id"].isin(sel_locs_s).to_numpy()
         view = sched.loc[mask].copy()
         if len(view) == 0:
             st.warning("Geen afspraken in dit bereik.")
         else:
             t1, t2 = st.tabs(["Per dag", "Per arts"])
             with t1:
-                day_groups = view.sort_values(["date", "start_time", "doctor_name"])
-                for d, df_day in day_groups.groupby("date"):
-                    st.markdown(f"### {d.isoformat()}")
-                    st.dataframe(df_day[["start_time","end_time","doctor_name","location_id","room","session_id"]].reset_index(drop=True), use_container_width=True)
+                # Eén geprojecteerde, gesorteerde view; groepen via posities (iloc) i.p.v. een kopie per groep
+                day_cols = ["start_time","end_time","doctor_name","location_id","room","session_id"]
+                view_day = view.sort_values(["date", "start_time", "doctor_name"]).loc[:, ["date"] + day_cols]
+                for d, idx in _group_positions(view_day, "date"):
+                    st.markdown(f"### {d.date().isoformat()}")
+                    st.dataframe(view_day.iloc[idx, 1:].reset_index(drop=True), use_container_width=True)
             with t2:
                 # Per arts groeperen
-                by_doc = view.sort_values(["doctor_name", "date", "start_time"])
-                for dn, df_doc in by_doc.groupby("doctor_name"):
+                doc_cols = ["date","start_time","end_time","location_id","room","session_id"]
+                by_doc = view.sort_values(["doctor_name", "date", "start_time"]).loc[:, ["doctor_name"] + doc_cols]
+                for dn, idx in _group_positions(by_doc, "doctor_name"):
                     st.markdown(f"### {dn}")
-                    st.dataframe(df_doc[["date","start_time","end_time","location_id","room","session_id"]].reset_index(drop=True), use_container_width=True)
+                    st.dataframe(
+                        by_doc.iloc[idx, 1:].reset_index(drop=True),
+                        use_container_width=True,
+                        column_config={"date": st.column_config.DateColumn("date", format="YYYY-MM-DD")},
+                    )
             # Export van gefilterde view
             st.download_button("Download gefilterde agenda (CSV)", data=view.to_csv(index=False), file_name="agenda_filtered.csv", mime="text/csv")
 else:
     with sidebar_panel.container():
         st.info("Sessiedetails worden hier getoond wanneer je in de Agenda-modus een sessie selecteert.")
 
+
+# Nog niet weggeschreven wijzigingen (binnen het interval) op de timer van _autosave_pending zetten
+if state.dfs.dirty:
+    _autosave_pending()
@@ -17,6 +17,7 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--travel_times", required=False, default=None, help="Pad naar travel_times.csv (optioneel)")
     p.add_argument("--doctor_workdays", required=False, default=None, help="Pad naar doctor_workdays.csv (optioneel)")
     p.add_argument("--doctor_week_rules", required=False, default=None, help="Pad naar doctor_week_rules.csv (optioneel)")
+    p.add_argument("--warm_start", action="store_true", help="Geef de solver een greedy toewijzing als startpunt (optioneel)")
     p.add_argument("--output", required=False, default="output/schedule.csv", help="Uitvoer CSV-bestand")
     return p.parse_args()
 
@@ -31,7 +32,7 @@ def main() -> int:
     workdays = read_doctor_workdays(args.doctor_workdays)
     week_rules = read_doctor_week_rules(args.doctor_week_rules)
 
-    assignments, objective = solve_schedule(doctors, locations, sessions, preferences, travel_times, workdays, week_rules)
+    assignments, objective = solve_schedule(doctors, locations, sessions, preferences, travel_times, workdays, week_rules, warm_start=args.warm_start)
     write_schedule_csv(args.output, assignments, doctors, locations, sessions)
     print(f"Rooster geschreven naar: {args.output} (totale voorkeursscore = {objective})")
     return 0
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import csv
+import io as _io
+import os
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from typing import IO, Dict, FrozenSet, Iterable, List, Optional, Tuple
 from datetime import date, time, datetime
 
 import pandas as pd
@@ -9,6 +13,51 @@ from dateutil import parser as dtparser
 
 from .models import Doctor, Location, Session, Preference, DoctorById, LocationById, SessionById, PreferenceScore, DoctorWeekRule, WorkdaysByDoctor, Weekday
 
+# Optioneel: PyArrow leest CSV multi-threaded en kolomgewijs; zonder pyarrow de C-parser van pandas
+try:
+    import pyarrow as pa  # type: ignore
+    from pyarrow import csv as pa_csv  # type: ignore
+except Exception:
+    pa = None
+    pa_csv = None
+
+
+# De standaard NA-markeringen van pandas; beide leespaden gebruiken deze lijst zodat ze dezelfde waarden geven
+_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+
+def _read_csv_str(path: str | Path | IO[bytes]) -> pd.DataFrame:
+    """CSV (pad of bestandsobject) met alle kolommen als tekst en lege/NA-cellen als ""."""
+    source = path
+    if hasattr(path, "read"):
+        # Bestandsobject (bv. upload) één keer uitlezen: header en parser moeten dezelfde bytes zien
+        data = path.read()
+        source = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+    if pa_csv is not None:
+        try:
+            # Kolomtypes expliciet op string, anders herkent arrow bv. "09:00" als tijd
+            if isinstance(source, bytes):
+                header = next(csv.reader([source.split(b"\n", 1)[0].decode("utf-8-sig")]), [])
+                arrow_source = pa.BufferReader(source)
+            else:
+                with open(source, newline="", encoding="utf-8-sig") as f:
+                    header = next(csv.reader(f), [])
+                arrow_source = source
+            convert = pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in header},
+                null_values=_NA_VALUES,
+                strings_can_be_null=True,
+            )
+            return pa_csv.read_csv(arrow_source, convert_options=convert).to_pandas().fillna("")
+        except (pa.ArrowInvalid, OSError):
+            pass
+    if isinstance(source, bytes):
+        source = _io.BytesIO(source)
+    return pd.read_csv(source, dtype=str, keep_default_na=False, na_values=_NA_VALUES).fillna("")
+
 
 def _split_tokens(value: str) -> List[str]:
     if value is None:
@@ -21,40 +70,93 @@ def _split_tokens(value: str) -> List[str]:
 
 
 def _parse_date(value: str) -> date:
-    return dtparser.parse(str(value)).date()
+    s = str(value).strip()
+    try:
+        # Snelle, strikte route voor het standaardformaat
+        return datetime.strptime(s, "%Y-%m-%d").date()
+    except ValueError:
+        return dtparser.parse(s).date()
 
 
 def _parse_time(value: str) -> time:
-    # Verwacht HH:MM, maar parser is tolerant
-    parsed = dtparser.parse(str(value))
+    # Verwacht HH:MM (of HH:MM:SS); alleen afwijkende notaties gaan via de tolerante parser
+    s = str(value).strip()
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(s, fmt).time()
+        except ValueError:
+            continue
+    parsed = dtparser.parse(s)
     return time(hour=parsed.hour, minute=parsed.minute, second=parsed.second)
 
 
+def _col(df: pd.DataFrame, name: str) -> pd.Series:
+    """Kolom als gestripte tekst; ontbrekende (optionele) kolommen leveren lege strings."""
+    if name not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[name].astype(str).str.strip()
+
+
+def _parse_date_column(values: pd.Series) -> pd.Series:
+    """Gevectoriseerde `_parse_date`: standaardformaat in één keer, afwijkende waarden per stuk."""
+    parsed = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce")
+    out = parsed.dt.date.astype(object)
+    bad = parsed.isna()
+    if bad.any():
+        out[bad] = [_parse_date(v) for v in values[bad]]
+    return out
+
+
+def _parse_time_column(values: pd.Series) -> pd.Series:
+    """Gevectoriseerde `_parse_time` voor HH:MM; overige notaties via `_parse_time`."""
+    parsed = pd.to_datetime(values, format="%H:%M", errors="coerce")
+    out = parsed.dt.time.astype(object)
+    bad = parsed.isna()
+    if bad.any():
+        out[bad] = [_parse_time(v) for v in values[bad]]
+    return out
+
+
 def read_doctors(path: str | Path) -> DoctorById:
-    df = pd.read_csv(path, dtype=str).fillna("")
+    df = _read_csv_str(path)
     required_cols = {"doctor_id", "name", "max_sessions", "unavailable_dates", "available_dates", "home_dates", "skills"}
     missing = required_cols.difference(set(df.columns))
     if missing:
         raise ValueError(f"Ontbrekende kolommen in doctors: {missing}")
 
+    # Veel artsen delen dezelfde datums (feestdagen, vakanties): elke unieke string één keer parsen
+    parsed_dates: Dict[str, date] = {}
+
+    def parse_cached(token: str) -> date:
+        d = parsed_dates.get(token)
+        if d is None:
+            d = parsed_dates[token] = _parse_date(token)
+        return d
+
     doctors: Dict[str, Doctor] = {}
-    for _, row in df.iterrows():
-        doctor_id = row["doctor_id"].strip()
+    columns = zip(
+        _col(df, "doctor_id"),
+        _col(df, "name"),
+        _col(df, "max_sessions"),
+        df["unavailable_dates"],
+        df["available_dates"],
+        df["home_dates"],
+        df["skills"],
+    )
+    for doctor_id, name, max_sessions_raw, unavail_raw, avail_raw, home_raw, skills_raw in columns:
         if not doctor_id:
             continue
-        name = row["name"].strip() or doctor_id
+        name = name or doctor_id
         try:
-            max_sessions = int(str(row["max_sessions"]).strip() or "0")
+            max_sessions = int(max_sessions_raw or "0")
         except ValueError:
             raise ValueError(f"max_sessions moet geheel getal zijn voor arts {doctor_id}")
 
-        unavailable_dates_raw = _split_tokens(row["unavailable_dates"])
-        unavailable_dates: Set[date] = set(_parse_date(d) for d in unavailable_dates_raw)
-        available_dates_raw = _split_tokens(row.get("available_dates", ""))
-        available_dates: Set[date] = set(_parse_date(d) for d in available_dates_raw)
-        home_dates_raw = _split_tokens(row.get("home_dates", ""))
-        home_dates: Set[date] = set(_parse_date(d) for d in home_dates_raw)
-        skills = set(t.lower() for t in _split_tokens(row["skills"]))
+        # frozenset: onveranderlijk (Doctor is frozen) en hashbaar, zodat de solver per unieke set kan cachen
+        unavailable_dates: FrozenSet[date] = frozenset(map(parse_cached, _split_tokens(unavail_raw)))
+        available_dates: FrozenSet[date] = frozenset(map(parse_cached, _split_tokens(avail_raw)))
+        home_dates: FrozenSet[date] = frozenset(map(parse_cached, _split_tokens(home_raw)))
+        skills = frozenset(t.lower() for t in _split_tokens(skills_raw))
 
         doctors[doctor_id] = Doctor(
             doctor_id=doctor_id,
@@ -69,51 +171,50 @@ def read_doctors(path: str | Path) -> DoctorById:
 
 
 def read_locations(path: str | Path) -> LocationById:
-    df = pd.read_csv(path, dtype=str).fillna("")
+    df = _read_csv_str(path)
     required_cols = {"location_id", "name"}
     missing = required_cols.difference(set(df.columns))
     if missing:
         raise ValueError(f"Ontbrekende kolommen in locations: {missing}")
 
     locations: Dict[str, Location] = {}
-    for _, row in df.iterrows():
-        location_id = row["location_id"].strip()
+    for location_id, name in zip(_col(df, "location_id"), _col(df, "name")):
         if not location_id:
             continue
-        name = row["name"].strip() or location_id
-        locations[location_id] = Location(location_id=location_id, name=name)
+        locations[location_id] = Location(location_id=location_id, name=name or location_id)
     return locations
 
 
 def read_sessions(path: str | Path) -> SessionById:
-    df = pd.read_csv(path, dtype=str).fillna("")
+    df = _read_csv_str(path)
     required_cols = {"session_id", "date", "location_id", "start_time", "end_time", "required_skill"}
     missing = required_cols.difference(set(df.columns))
     if missing:
         raise ValueError(f"Ontbrekende kolommen in sessions: {missing}")
 
     sessions: Dict[str, Session] = {}
-    for _, row in df.iterrows():
-        session_id = row["session_id"].strip()
-        if not session_id:
-            continue
-        session_date = _parse_date(row["date"])
-        location_id = row["location_id"].strip()
-        start_time = _parse_time(row["start_time"])
-        end_time = _parse_time(row["end_time"])
-        required_skill_raw = str(row["required_skill"]).strip()
-        required_skill = required_skill_raw.lower() if required_skill_raw else None
+    session_ids = _col(df, "session_id")
+    # Rijen zonder session_id worden overgeslagen (en dus ook niet geparsed)
+    df = df[session_ids != ""]
+    session_ids = session_ids[session_ids != ""]
+    columns = zip(
+        session_ids,
+        _parse_date_column(_col(df, "date")),
+        _col(df, "location_id"),
+        _parse_time_column(_col(df, "start_time")),
+        _parse_time_column(_col(df, "end_time")),
+        _col(df, "required_skill").str.lower(),
         # Optionele kolom: room
-        room = ""
-        if "room" in df.columns:
-            room = str(row["room"]).strip()
+        _col(df, "room"),
+    )
+    for session_id, session_date, location_id, start_time, end_time, required_skill, room in columns:
         sessions[session_id] = Session(
             session_id=session_id,
             date=session_date,
             location_id=location_id,
             start_time=start_time,
             end_time=end_time,
-            required_skill=required_skill,
+            required_skill=required_skill or None,
             room=room,
         )
     return sessions
@@ -126,17 +227,15 @@ def read_travel_times(path: Optional[str | Path]) -> Dict[tuple, int]:
     """
     if path is None:
         return {}
-    df = pd.read_csv(path, dtype=str).fillna("")
+    df = _read_csv_str(path)
     required_cols = {"from_location_id", "to_location_id", "minutes"}
     missing = required_cols.difference(set(df.columns))
     if missing:
         raise ValueError(f"Ontbrekende kolommen in travel_times: {missing}")
     tt: Dict[tuple, int] = {}
-    for _, row in df.iterrows():
-        a = row["from_location_id"].strip()
-        b = row["to_location_id"].strip()
+    for a, b, minutes in zip(_col(df, "from_location_id"), _col(df, "to_location_id"), _col(df, "minutes")):
         try:
-            m = int(str(row["minutes"]).strip())
+            m = int(minutes)
         except ValueError:
             raise ValueError(f"minutes moet geheel getal zijn voor {a}->{b}")
         if a and b:
@@ -147,20 +246,18 @@ def read_travel_times(path: Optional[str | Path]) -> Dict[tuple, int]:
 def read_preferences(path: Optional[str | Path]) -> PreferenceScore:
     if path is None:
         return {}
-    df = pd.read_csv(path, dtype=str).fillna("")
+    df = _read_csv_str(path)
     required_cols = {"doctor_id", "location_id", "score"}
     missing = required_cols.difference(set(df.columns))
     if missing:
         raise ValueError(f"Ontbrekende kolommen in preferences: {missing}")
 
     prefs: PreferenceScore = {}
-    for _, row in df.iterrows():
-        doctor_id = row["doctor_id"].strip()
-        location_id = row["location_id"].strip()
+    for doctor_id, location_id, score_raw in zip(_col(df, "doctor_id"), _col(df, "location_id"), _col(df, "score")):
         if not (doctor_id and location_id):
             continue
         try:
-            score = int(str(row["score"]).strip())
+            score = int(score_raw)
         except ValueError:
             raise ValueError(f"score moet geheel getal zijn voor preference {doctor_id}-{location_id}")
         prefs[(doctor_id, location_id)] = score
@@ -173,6 +270,12 @@ def ensure_parent_dir(path: str | Path) -> None:
         p.parent.mkdir(parents=True, exist_ok=True)
 
 
+_SCHEDULE_COLUMNS = (
+    "session_id", "date", "location_id", "location_name", "doctor_id",
+    "doctor_name", "start_time", "end_time", "required_skill", "room",
+)
+
+
 def write_schedule_csv(
     path: str | Path,
     assignments: Dict[str, str],
@@ -181,24 +284,30 @@ def write_schedule_csv(
     sessions: SessionById,
 ) -> None:
     ensure_parent_dir(path)
-    rows = []
+    # Rijen als tuples in vaste kolomvolgorde; sorteren en wegschrijven zonder tussenliggend DataFrame
+    rows: List[Tuple[str, ...]] = []
     for session_id, doctor_id in assignments.items():
         s = sessions[session_id]
         d = doctors[doctor_id]
         loc = locations.get(s.location_id)
-        rows.append({
-            "session_id": s.session_id,
-            "date": s.date.isoformat(),
-            "location_id": s.location_id,
-            "location_name": (loc.name if loc else s.location_id),
-            "doctor_id": d.doctor_id,
-            "doctor_name": d.name,
-            "start_time": s.start_time.strftime("%H:%M"),
-            "end_time": s.end_time.strftime("%H:%M"),
-            "required_skill": s.required_skill or "",
-            "room": getattr(s, "room", "") or "",
-        })
-    pd.DataFrame(rows).sort_values(["date", "location_id", "start_time"]).to_csv(path, index=False)
+        rows.append((
+            s.session_id,
+            s.date.isoformat(),
+            s.location_id,
+            loc.name if loc else s.location_id,
+            d.doctor_id,
+            d.name,
+            s.start_time.strftime("%H:%M"),
+            s.end_time.strftime("%H:%M"),
+            s.required_skill or "",
+            getattr(s, "room", "") or "",
+        ))
+    # Stabiel, net als sort_values: op date, location_id, start_time
+    rows.sort(key=itemgetter(1, 2, 6))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(_SCHEDULE_COLUMNS)
+        writer.writerows(rows)
 
 
 _WEEKDAY_MAP = {
@@ -215,15 +324,21 @@ _WEEKDAY_MAP = {
 
 def _parse_weekday(value: str) -> Weekday:
     key = str(value).strip().lower()
-    if key in _WEEKDAY_MAP:
-        return _WEEKDAY_MAP[key]
-    try:
-        v = int(key)
-        if 1 <= v <= 7:
-            return v
-    except ValueError:
-        pass
-    raise ValueError(f"Onbekende weekday: {value}")
+    wd = _WEEKDAY_MAP.get(key)
+    if wd is None and key.isdigit() and 1 <= int(key) <= 7:
+        wd = int(key)  # bv. "01"
+    if wd is None:
+        raise ValueError(f"Onbekende weekday: {value}")
+    return wd
+
+
+def _weekday_column(values: pd.Series) -> pd.Series:
+    """Gevectoriseerde `_parse_weekday`: één map over de kolom, alleen missers per stuk (die kunnen raisen)."""
+    mapped = values.astype(str).str.strip().str.lower().map(_WEEKDAY_MAP)
+    missing = mapped.isna()
+    if missing.any():
+        mapped[missing] = [_parse_weekday(v) for v in values[missing]]
+    return mapped.astype(int)
 
 
 def read_doctor_workdays(path: Optional[str | Path]) -> WorkdaysByDoctor:
@@ -233,17 +348,15 @@ def read_doctor_workdays(path: Optional[str | Path]) -> WorkdaysByDoctor:
     """
     if path is None:
         return {}
-    df = pd.read_csv(path, dtype=str).fillna("")
+    df = _read_csv_str(path)
     required_cols = {"doctor_id", "weekday"}
     missing = required_cols.difference(set(df.columns))
     if missing:
         raise ValueError(f"Ontbrekende kolommen in doctor_workdays: {missing}")
     workdays: WorkdaysByDoctor = {}
-    for _, row in df.iterrows():
-        doctor_id = row["doctor_id"].strip()
-        if not doctor_id:
-            continue
-        wd = _parse_weekday(row["weekday"])
+    doctor_ids = _col(df, "doctor_id")
+    has_doctor = doctor_ids != ""
+    for doctor_id, wd in zip(doctor_ids[has_doctor], _weekday_column(df.loc[has_doctor, "weekday"])):
         workdays.setdefault(doctor_id, set()).add(wd)
     return workdays
 
@@ -256,24 +369,21 @@ def read_doctor_week_rules(path: Optional[str | Path]) -> List[DoctorWeekRule]:
     """
     if path is None:
         return []
-    df = pd.read_csv(path, dtype=str).fillna("")
+    df = _read_csv_str(path)
     required_cols = {"doctor_id", "week_of_month", "weekday", "location_id"}
     missing = required_cols.difference(set(df.columns))
     if missing:
         raise ValueError(f"Ontbrekende kolommen in doctor_week_rules: {missing}")
     rules: List[DoctorWeekRule] = []
-    for _, row in df.iterrows():
-        doctor_id = row["doctor_id"].strip()
-        if not doctor_id:
-            continue
+    df = df[_col(df, "doctor_id") != ""]
+    columns = zip(_col(df, "doctor_id"), _col(df, "week_of_month"), _weekday_column(df["weekday"]), _col(df, "location_id"))
+    for doctor_id, wom_raw, wd, loc in columns:
         try:
-            wom = int(str(row["week_of_month"]).strip())
+            wom = int(wom_raw)
         except ValueError:
             raise ValueError(f"week_of_month moet 1..5 zijn voor arts {doctor_id}")
         if wom < 1 or wom > 5:
             raise ValueError(f"week_of_month buiten bereik (1..5) voor arts {doctor_id}")
-        wd = _parse_weekday(row["weekday"])
-        loc = row["location_id"].strip()
         if not loc:
             continue
         rules.append(DoctorWeekRule(doctor_id=doctor_id, week_of_month=wom, weekday=wd, location_id=loc))
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import date, time
-from typing import Dict, List, Optional, Set
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+import numpy as np
 
 
 @dataclass(frozen=True)
@@ -10,10 +12,10 @@ class Doctor:
     doctor_id: str
     name: str
     max_sessions: int
-    unavailable_dates: Set[date]
-    available_dates: Set[date]
-    home_dates: Set[date]
-    skills: Set[str]
+    unavailable_dates: FrozenSet[date]
+    available_dates: FrozenSet[date]
+    home_dates: FrozenSet[date]
+    skills: FrozenSet[str]
 
 
 @dataclass(frozen=True)
@@ -33,6 +35,54 @@ class Session:
     room: str = ""
 
 
+def _seconds(t: time) -> int:
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+@dataclass(frozen=True, eq=False)
+class SessionTable:
+    """Kolomgewijze (SoA) weergave van sessies voor gevectoriseerde checks.
+
+    Rij i hoort bij session_ids[i]; de volgorde is die van de bron-iterable.
+    """
+    session_ids: List[str]
+    day: np.ndarray             # int32, date.toordinal()
+    location_codes: np.ndarray  # int32, index in `locations`
+    locations: List[str]
+    start_sec: np.ndarray       # int32, seconden sinds middernacht
+    end_sec: np.ndarray         # int32
+    skill_codes: np.ndarray     # int32, index in `skills`; -1 = geen skill vereist
+    skills: List[str]
+    weekday: np.ndarray         # int8, 1=ma..7=zo
+    week_of_month: np.ndarray   # int8, 1..5 (dagen 1-7 => 1, 8-14 => 2, ...)
+
+    @classmethod
+    def from_sessions(cls, sessions: Iterable[Session]) -> "SessionTable":
+        session_list = list(sessions)
+        loc_index: Dict[str, int] = {}
+        codes = [loc_index.setdefault(s.location_id, len(loc_index)) for s in session_list]
+        skill_index: Dict[str, int] = {}
+        skill_codes = [skill_index.setdefault(s.required_skill, len(skill_index)) if s.required_skill else -1 for s in session_list]
+        day = np.fromiter((s.date.toordinal() for s in session_list), dtype=np.int32, count=len(session_list))
+        dom = np.fromiter((s.date.day for s in session_list), dtype=np.int8, count=len(session_list))
+        return cls(
+            session_ids=[s.session_id for s in session_list],
+            day=day,
+            location_codes=np.asarray(codes, dtype=np.int32),
+            locations=list(loc_index),
+            start_sec=np.fromiter((_seconds(s.start_time) for s in session_list), dtype=np.int32, count=len(session_list)),
+            end_sec=np.fromiter((_seconds(s.end_time) for s in session_list), dtype=np.int32, count=len(session_list)),
+            skill_codes=np.asarray(skill_codes, dtype=np.int32),
+            skills=list(skill_index),
+            # ordinal 1 (0001-01-01) is een maandag
+            weekday=((day - 1) % 7 + 1).astype(np.int8),
+            week_of_month=((dom - 1) // 7 + 1).astype(np.int8),
+        )
+
+    def __len__(self) -> int:
+        return len(self.session_ids)
+
+
 @dataclass(frozen=True)
 class Preference:
     doctor_id: str
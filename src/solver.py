@@ -1,35 +1,151 @@
 from __future__ import annotations
 
-from typing import Dict, List, Tuple, Set, DefaultDict
-from datetime import datetime
+import os
+from typing import Dict, FrozenSet, Iterable, List, Tuple, Set
 
+import numpy as np
 from ortools.sat.python import cp_model
 
-from .models import Doctor, Location, Session, DoctorById, LocationById, SessionById, PreferenceScore, DoctorWeekRule, WorkdaysByDoctor
+# Optioneel: Numba compileert de paar-sweep naar native code; zonder numba draait dezelfde functie in Python
+try:
+    from numba import njit  # type: ignore
+except Exception:
+    njit = None
 
+from .models import SessionTable, DoctorById, LocationById, SessionById, PreferenceScore, DoctorWeekRule, WorkdaysByDoctor
 
-def _time_overlap(start_a, end_a, start_b, end_b) -> bool:
-    # Overlap als intervallen elkaar snijden: a_start < b_end en b_start < a_end
-    return (start_a < end_b) and (start_b < end_a)
 
+def _conflict_pairs_py(day, start, end, loc, travel, n_locs, out_a, out_b) -> int:
+    """Conflicterende paren in sessies gesorteerd op (dag, start); retourneert het aantal paren.
 
-def _build_overlap_pairs(sessions: List[Session]) -> Dict[str, List[str]]:
-    # Per datum: markeer overlappende sessiepaaren
-    by_date: Dict[str, List[Session]] = {}
-    for s in sessions:
-        key = s.date.isoformat()
-        by_date.setdefault(key, []).append(s)
-    overlaps: Dict[str, List[str]] = {}
-    for day, sess_list in by_date.items():
-        n = len(sess_list)
-        for i in range(n):
-            for j in range(i + 1, n):
-                a = sess_list[i]
-                b = sess_list[j]
-                if _time_overlap(a.start_time, a.end_time, b.start_time, b.end_time):
-                    overlaps.setdefault(a.session_id, []).append(b.session_id)
-                    overlaps.setdefault(b.session_id, []).append(a.session_id)
-    return overlaps
+    Schrijft alleen zolang out_a/out_b plaats hebben, maar telt altijd door: een resultaat groter
+    dan de buffer betekent opnieuw draaien met een buffer van precies die grootte.
+
+    Een paar (p, q) met p vóór q conflicteert als de intervallen overlappen of als de gap
+    korter is dan de reistijd travel[loc[p] * n_locs + loc[q]]. Zodra q op een andere dag
+    valt stopt de binnenste lus. Werkt op lijsten (Python) en op numpy-arrays (Numba).
+    """
+    k = 0
+    n = len(day)
+    for p in range(n):
+        day_p = day[p]
+        start_p = start[p]
+        end_p = end[p]
+        row = loc[p] * n_locs
+        for q in range(p + 1, n):
+            if day[q] != day_p:
+                break
+            # Overlap als intervallen elkaar snijden: a_start < b_end en b_start < a_end
+            if (start_p < end[q] and start[q] < end_p) or start[q] - end_p < travel[row + loc[q]]:
+                if k < len(out_a):
+                    out_a[k] = p
+                    out_b[k] = q
+                k += 1
+    return k
+
+
+_conflict_pairs_nb = njit(cache=True)(_conflict_pairs_py) if njit is not None else None
+
+
+def _conflict_pairs(
+    day: np.ndarray, start: np.ndarray, end: np.ndarray, loc: np.ndarray, travel: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Posities (a, b) van conflicterende paren; invoer gesorteerd op (dag, start), travel is L x L."""
+    n_locs = travel.shape[0]
+    # Buffer lineair in het aantal sessies; past het niet, dan één tweede ronde met het exacte aantal
+    capacity = 4 * len(day)
+    if _conflict_pairs_nb is not None:
+        flat = travel.ravel()
+        while True:
+            out_a = np.empty(capacity, dtype=np.int64)
+            out_b = np.empty(capacity, dtype=np.int64)
+            k = _conflict_pairs_nb(day, start, end, loc, flat, n_locs, out_a, out_b)
+            if k <= capacity:
+                return out_a[:k], out_b[:k]
+            capacity = k
+    args = (day.tolist(), start.tolist(), end.tolist(), loc.tolist(), travel.ravel().tolist(), n_locs)
+    while True:
+        out_a_list = [0] * capacity
+        out_b_list = [0] * capacity
+        k = _conflict_pairs_py(*args, out_a_list, out_b_list)
+        if k <= capacity:
+            return np.asarray(out_a_list[:k], dtype=np.int64), np.asarray(out_b_list[:k], dtype=np.int64)
+        capacity = k
+
+
+def _clique_cover(adj: Dict[int, Set[int]]) -> List[List[int]]:
+    """Greedy cliques die samen alle kanten van de conflictgraaf dekken.
+
+    Start bij elke nog niet gedekte kant en breid uit met de buur met de hoogste graad
+    die met alle leden conflicteert; deterministisch door tie-break op index.
+    """
+    def rank(v: int) -> Tuple[int, int]:
+        return (-len(adj[v]), v)
+
+    covered: Set[Tuple[int, int]] = set()
+    cliques: List[List[int]] = []
+    for a in sorted(adj, key=rank):
+        for b in sorted(adj[a], key=rank):
+            if (min(a, b), max(a, b)) in covered:
+                continue
+            clique = [a, b]
+            candidates = adj[a] & adj[b]
+            while candidates:
+                c = min(candidates, key=rank)
+                clique.append(c)
+                candidates &= adj[c]
+            for x in range(len(clique)):
+                for y in range(x + 1, len(clique)):
+                    u, v = clique[x], clique[y]
+                    covered.add((min(u, v), max(u, v)))
+            cliques.append(clique)
+    return cliques
+
+
+def _greedy_assignment(
+    doctors_by_session: Dict[int, List[int]],
+    capacity: List[int],
+    scores: Dict[Tuple[int, int], int],
+    conflicts: Dict[int, Set[int]],
+) -> Dict[int, int]:
+    """Snelle toewijzing session-index -> arts-index als startpunt voor de solver.
+
+    Sessies met de minste kandidaten eerst; per sessie de arts met de hoogste voorkeur die nog
+    capaciteit heeft en geen conflicterende sessie draagt. Sessies zonder geschikte arts blijven open.
+    """
+    load = [0] * len(capacity)
+    taken: Dict[int, Set[int]] = {}
+    result: Dict[int, int] = {}
+    for s_idx in sorted(doctors_by_session, key=lambda k: len(doctors_by_session[k])):
+        clashing = conflicts.get(s_idx, set())
+        best = None
+        for i in doctors_by_session[s_idx]:
+            if load[i] >= capacity[i] or not clashing.isdisjoint(taken.get(i, ())):
+                continue
+            if best is None or scores[(i, s_idx)] > scores[(best, s_idx)]:
+                best = i
+        if best is not None:
+            result[s_idx] = best
+            load[best] += 1
+            taken.setdefault(best, set()).add(s_idx)
+    return result
+
+
+def _order_symmetric(assignment: Dict[int, int], classes: Iterable[List[int]]) -> Dict[int, int]:
+    # Binnen een klasse uitwisselbare artsen de pakketten aflopend op grootte verdelen,
+    # zodat de hint ook aan de symmetriebreking voldoet
+    by_doctor: Dict[int, List[int]] = {}
+    for s_idx, i in assignment.items():
+        by_doctor.setdefault(i, []).append(s_idx)
+    result = dict(assignment)
+    for members in classes:
+        if len(members) < 2:
+            continue
+        bundles = sorted((by_doctor.get(i, []) for i in members), key=len, reverse=True)
+        for i, bundle in zip(members, bundles):
+            for s_idx in bundle:
+                result[s_idx] = i
+    return result
 
 
 def solve_schedule(
@@ -40,8 +156,12 @@ def solve_schedule(
     travel_minutes: Dict[tuple, int] | None = None,
     workdays_by_doctor: WorkdaysByDoctor | None = None,
     week_rules: List[DoctorWeekRule] | None = None,
+    warm_start: bool = False,
 ) -> Tuple[Dict[str, str], int]:
     """
+    warm_start: geef een greedy toewijzing als hint mee. Standaard uit: op gewone invoer vindt
+    de LP-worker het optimum zonder hint sneller; de hint helpt vooral bij een korte tijdslimiet.
+
     Retourneert:
       - assignments: dict session_id -> doctor_id
       - objective_value: totale voorkeursscore
@@ -50,140 +170,183 @@ def solve_schedule(
     session_list = list(sessions.values())
 
     doctor_index = {d.doctor_id: idx for idx, d in enumerate(doctor_list)}
-    session_index = {s.session_id: idx for idx, s in enumerate(session_list)}
 
     model = cp_model.CpModel()
 
-    # Helpers voor ritme
-    def weekday1_7(dt) -> int:
-        # Python: Monday=0..Sunday=6 -> 1..7
-        return int(dt.weekday()) + 1
-
-    def week_of_month1_5(dt) -> int:
-        # Simpel: dagen 1-7 => 1, 8-14 => 2, 15-21 => 3, 22-28 => 4, 29-31 => 5
-        return (int(dt.day) - 1) // 7 + 1
-
     if workdays_by_doctor is None:
         workdays_by_doctor = {}
     if week_rules is None:
         week_rules = []
 
-    # Indexeer weekregels per (doctor_id, wom, weekday)
-    rules_index: Dict[Tuple[str, int, int], Set[str]] = {}
+    # Indexeer weekregels per arts: (week_of_month, weekday) -> toegestane locaties
+    rules_by_doctor: Dict[str, Dict[Tuple[int, int], Set[str]]] = {}
     for r in week_rules:
-        key = (r.doctor_id, int(r.week_of_month), int(r.weekday))
-        rules_index.setdefault(key, set()).add(r.location_id)
+        key = (int(r.week_of_month), int(r.weekday))
+        rules_by_doctor.setdefault(r.doctor_id, {}).setdefault(key, set()).add(r.location_id)
+
+    # Sessies kolomgewijs; per arts één boolean-masker over alle sessies i.p.v. een check per (arts, sessie)
+    table = SessionTable.from_sessions(session_list)
+    # Eén keer chronologisch sorteren op (dag, start); stabiel, dus bij gelijke start in bronvolgorde
+    chrono = np.lexsort((table.start_sec, table.day))
+    loc_code = {loc: code for code, loc in enumerate(table.locations)}
+    skill_code = {skill: code for code, skill in enumerate(table.skills)}
+
+    # Voorkeuren als matrix [arts, locatiecode]; ontbrekende combinaties tellen als 0
+    pref = np.zeros((len(doctor_list), len(table.locations)), dtype=np.int64)
+    for (did, lid), score in preferences.items():
+        if did in doctor_index and lid in loc_code:
+            pref[doctor_index[did], loc_code[lid]] = int(score)
+    pref_rows = pref.tolist()
+
+    # Datumsets als ordinals, één keer per unieke set (artsen delen vaak dezelfde of lege sets)
+    ordinals_cache: Dict[FrozenSet, List[int]] = {}
+
+    def ordinals(dates) -> List[int]:
+        key = frozenset(dates)
+        cached = ordinals_cache.get(key)
+        if cached is None:
+            cached = ordinals_cache[key] = sorted(dt.toordinal() for dt in key)
+        return cached
+
+    # Per-arts attributen één keer vooraf, geïndexeerd op i (lege lijst = geen beperking/uitzondering)
+    unavailable_by_doctor = [ordinals(d.unavailable_dates) for d in doctor_list]
+    available_by_doctor = [ordinals(getattr(d, "available_dates", None) or ()) for d in doctor_list]
+    workdays_by_index = [sorted(workdays_by_doctor.get(d.doctor_id) or ()) for d in doctor_list]
+    skills_by_doctor = [[skill_code[k] for k in d.skills if k in skill_code] for d in doctor_list]
+    no_skill = table.skill_codes == -1
 
-    # Variabelen x[i,s] alleen voor toegestane combinaties (schaalt beter)
+    # Variabelen x[i,s] alleen voor toegestane combinaties (schaalt beter).
+    # Bewust Booleans i.p.v. één integer assign[s] per sessie: capaciteit en doelfunctie hebben de
+    # indicatoren per (arts, sessie) toch nodig, en AllDifferent op assign is zwakker dan de
+    # AtMostOne-cliques per arts (gemeten: trager en slechtere oplossingen binnen de tijdslimiet).
     x_vars: Dict[Tuple[int, int], cp_model.IntVar] = {}
-    allowed_pairs: Dict[int, List[int]] = {}
+    # Dezelfde variabelen per sessie en per arts, zodat de constraints geen scan over x_vars nodig hebben
+    vars_by_session: Dict[int, List[cp_model.IntVar]] = {}
+    vars_by_doctor: Dict[int, List[cp_model.IntVar]] = {}
+    # Arts-indices per sessie, oplopend (de buitenste lus loopt over de artsen)
+    doctors_by_session: Dict[int, List[int]] = {}
+    symmetry_classes: Dict[Tuple[bytes, int, Tuple[int, ...]], List[int]] = {}
     for i, d in enumerate(doctor_list):
-        for s_idx, s in enumerate(session_list):
-            # Beschikbaarheid op datum (onbeschikbaar wint altijd)
-            if s.date in d.unavailable_dates:
-                continue
-            # Skill
-            if s.required_skill and (s.required_skill not in d.skills):
-                continue
-            # Ritme: vaste werkdagen (optioneel) — uitzonderingen via available_dates
-            wd = weekday1_7(s.date)
-            wd_set = workdays_by_doctor.get(d.doctor_id)
-            if wd_set is not None and len(wd_set) > 0 and wd not in wd_set:
-                # alleen toestaan als expliciet als beschikbaar gezet
-                avail_override = getattr(d, "available_dates", set())
-                if s.date not in avail_override:
-                    continue
-            # Weekregel: als er regels zijn voor (week_of_month, weekday), dan alleen die locaties toestaan
-            wom = week_of_month1_5(s.date)
-            allowed_locs = rules_index.get((d.doctor_id, wom, wd))
-            if allowed_locs is not None and len(allowed_locs) > 0 and s.location_id not in allowed_locs:
+        # Skill
+        allowed = no_skill | np.isin(table.skill_codes, skills_by_doctor[i])
+        # Beschikbaarheid op datum (onbeschikbaar wint altijd)
+        if unavailable_by_doctor[i]:
+            allowed &= ~np.isin(table.day, unavailable_by_doctor[i])
+        # Ritme: vaste werkdagen (optioneel) — uitzonderingen via available_dates
+        if workdays_by_index[i]:
+            on_workday = np.isin(table.weekday, workdays_by_index[i])
+            if available_by_doctor[i]:
+                on_workday |= np.isin(table.day, available_by_doctor[i])
+            allowed &= on_workday
+        # Weekregel: als er regels zijn voor (week_of_month, weekday), dan alleen die locaties toestaan
+        for (wom, wd), allowed_locs in rules_by_doctor.get(d.doctor_id, {}).items():
+            if not allowed_locs:
                 continue
+            in_slot = (table.week_of_month == wom) & (table.weekday == wd)
+            codes = [loc_code[loc] for loc in allowed_locs if loc in loc_code]
+            allowed &= ~in_slot | np.isin(table.location_codes, codes)
+        # Artsen met dezelfde toegestane sessies, capaciteit en voorkeuren zijn onderling uitwisselbaar
+        symmetry_classes.setdefault((allowed.tobytes(), d.max_sessions, tuple(pref_rows[i])), []).append(i)
+        for s_idx in np.flatnonzero(allowed).tolist():
+            s = session_list[s_idx]
             var = model.NewBoolVar(f"x_{d.doctor_id}_{s.session_id}")
             x_vars[(i, s_idx)] = var
-            allowed_pairs.setdefault(s_idx, []).append(i)
+            vars_by_session.setdefault(s_idx, []).append(var)
+            vars_by_doctor.setdefault(i, []).append(var)
+            doctors_by_session.setdefault(s_idx, []).append(i)
+
+    # Geen enkele arts kan deze sessie invullen -> infeasible; meteen melden i.p.v. de solver te laten zoeken
+    unfillable = [s.session_id for s_idx, s in enumerate(session_list) if s_idx not in vars_by_session]
+    if unfillable:
+        raise ValueError(
+            "Geen oplossing gevonden (infeasible). Sessies zonder geschikte arts: " + ", ".join(unfillable)
+        )
 
     # Elke sessie exact 1 arts
-    for s_idx, s in enumerate(session_list):
-        vars_for_session = [x_vars[(i, s_idx)] for i in allowed_pairs.get(s_idx, [])]
-        if not vars_for_session:
-            # Geen enkele arts kan deze sessie invullen -> infeasible
-            # We kunnen ook optioneel soft maken, maar MVP: hard constraint
-            model.AddBoolOr([])  # onoplosbare clause om infeasible te forceren
-        else:
-            model.Add(sum(vars_for_session) == 1)
+    for s_idx in range(len(session_list)):
+        model.AddExactlyOne(vars_by_session[s_idx])
 
     # Capaciteit per arts
     for i, d in enumerate(doctor_list):
-        vars_for_doctor = [x_vars[(i, s_idx)] for (i2, s_idx) in x_vars.keys() if i2 == i]
+        vars_for_doctor = vars_by_doctor.get(i)
         if vars_for_doctor:
-            model.Add(sum(vars_for_doctor) <= d.max_sessions)
+            if d.max_sessions == 1:
+                # Booleaanse propagator i.p.v. de lineaire
+                model.AddAtMostOne(vars_for_doctor)
+            else:
+                model.Add(sum(vars_for_doctor) <= d.max_sessions)
 
-    # Geen overlap per arts op dezelfde dag
-    overlaps_by_session = _build_overlap_pairs(session_list)
-    for i, d in enumerate(doctor_list):
-        for s_id, overlap_ids in overlaps_by_session.items():
-            s_idx = session_index[s_id]
-            if (i, s_idx) not in x_vars:
-                continue
-            for t_id in overlap_ids:
-                t_idx = session_index[t_id]
-                if (i, t_idx) not in x_vars:
-                    continue
-                # x[i,s] + x[i,t] <= 1
-                model.Add(x_vars[(i, s_idx)] + x_vars[(i, t_idx)] <= 1)
+    # Symmetriebreking: binnen een klasse uitwisselbare artsen aflopend op aantal sessies,
+    # zodat de solver niet alle permutaties van dezelfde verdeling doorzoekt
+    for members in symmetry_classes.values():
+        for i, j in zip(members, members[1:]):
+            if i in vars_by_doctor:
+                model.Add(sum(vars_by_doctor[i]) >= sum(vars_by_doctor[j]))
 
     # Reistijd constraint: als tijd tussen sessies < travel_minutes(from,to), dan niet dezelfde arts
     if travel_minutes is None:
         travel_minutes = {}
 
-    def get_travel(a_loc: str, b_loc: str) -> int:
-        if a_loc == b_loc:
-            return 0
-        if (a_loc, b_loc) in travel_minutes:
-            return int(travel_minutes[(a_loc, b_loc)])
-        if (b_loc, a_loc) in travel_minutes:
-            return int(travel_minutes[(b_loc, a_loc)])
-        # Als onbekend: conservatief hoog (onhaalbaar na elkaar)
-        return 10**6
-
-    # Alleen paren op dezelfde dag (volgorde-respecterend)
-    by_date: Dict[str, List[Session]] = {}
-    for s in session_list:
-        by_date.setdefault(s.date.isoformat(), []).append(s)
-    for day, sess_list in by_date.items():
-        # Sorteer op starttijd voor efficiënte checks
-        sess_list_sorted = sorted(sess_list, key=lambda s: s.start_time)
-        for idx_a, a in enumerate(sess_list_sorted):
-            for idx_b in range(idx_a + 1, len(sess_list_sorted)):
-                b = sess_list_sorted[idx_b]
-                # a -> b volgorde
-                required_gap = get_travel(a.location_id, b.location_id)
-                # Beschikbare gap in minuten
-                gap_minutes = (datetime.combine(a.date, b.start_time) - datetime.combine(a.date, a.end_time)).total_seconds() / 60.0
-                if gap_minutes < required_gap:
-                    a_idx = session_index[a.session_id]
-                    b_idx = session_index[b.session_id]
-                    for i, _d in enumerate(doctor_list):
-                        if (i, a_idx) in x_vars and (i, b_idx) in x_vars:
-                            model.Add(x_vars[(i, a_idx)] + x_vars[(i, b_idx)] <= 1)
+    # Reistijd als matrix op locatiecode (in seconden); (a, b) gaat voor (b, a), onbekend is
+    # conservatief hoog (onhaalbaar na elkaar) en dezelfde locatie kost niets
+    n_locs = len(table.locations)
+    travel = np.full((n_locs, n_locs), 10**6 * 60, dtype=np.int64)
+    known = [(loc_code[a], loc_code[b], int(m) * 60) for (a, b), m in travel_minutes.items() if a in loc_code and b in loc_code]
+    for a, b, secs in known:
+        travel[b, a] = secs
+    for a, b, secs in known:
+        travel[a, b] = secs
+    np.fill_diagonal(travel, 0)
+
+    # Elke sessie heeft hier kandidaten (anders is hierboven al gemeld): alle sessies chronologisch
+    pos_a, pos_b = _conflict_pairs(
+        table.day[chrono], table.start_sec[chrono], table.end_sec[chrono], table.location_codes[chrono], travel
+    )
+
+    # Conflictgraaf over alle dagen (er lopen geen kanten tussen dagen)
+    conflicts: Dict[int, Set[int]] = {}
+    for a_idx, b_idx in zip(chrono[pos_a].tolist(), chrono[pos_b].tolist()):
+        conflicts.setdefault(a_idx, set()).add(b_idx)
+        conflicts.setdefault(b_idx, set()).add(a_idx)
+    # Per arts hooguit één sessie uit elke clique: één AddAtMostOne i.p.v. alle paren
+    for clique in _clique_cover(conflicts):
+        vars_by_doc: Dict[int, List[cp_model.IntVar]] = {}
+        for s_idx in clique:
+            for i in doctors_by_session[s_idx]:
+                vars_by_doc.setdefault(i, []).append(x_vars[(i, s_idx)])
+        # Eén kandidaat in de clique kan niet conflicteren: alleen vanaf twee variabelen een constraint
+        for clique_vars in vars_by_doc.values():
+            if len(clique_vars) >= 2:
+                model.AddAtMostOne(clique_vars)
 
     # Doelfunctie: max sum voorkeursscore(i, locatie(s)) * x[i,s]
-    terms = []
+    # Parallelle lijsten i.p.v. score * var per term: WeightedSum bouwt de expressie in één keer
+    obj_vars: List[cp_model.IntVar] = []
+    obj_weights: List[int] = []
+    loc_of = table.location_codes.tolist()
     for (i, s_idx), var in x_vars.items():
-        s = session_list[s_idx]
-        d = doctor_list[i]
-        score = int(preferences.get((d.doctor_id, s.location_id), 0))
+        score = pref_rows[i][loc_of[s_idx]]
         if score != 0:
-            terms.append(score * var)
-    if terms:
-        model.Maximize(sum(terms))
+            obj_vars.append(var)
+            obj_weights.append(score)
+    if obj_vars:
+        model.Maximize(cp_model.LinearExpr.WeightedSum(obj_vars, obj_weights))
     else:
         # Geen voorkeuren: arbitraire oplossing, minimaliseer som indices (stabieler)
         model.Maximize(0)
 
+    # Warme start: een greedy toewijzing als hint (alleen sturing, geen harde constraint)
+    if warm_start:
+        scores = {(i, s_idx): pref_rows[i][loc_of[s_idx]] for (i, s_idx) in x_vars}
+        greedy = _greedy_assignment(doctors_by_session, [d.max_sessions for d in doctor_list], scores, conflicts)
+        greedy = _order_symmetric(greedy, symmetry_classes.values())
+        for (i, s_idx), var in x_vars.items():
+            model.AddHint(var, 1 if greedy.get(s_idx) == i else 0)
+
     solver = cp_model.CpSolver()
     solver.parameters.max_time_in_seconds = 20.0  # redelijke timeout voor MVP
-    solver.parameters.num_search_workers = 8
+    # Eén worker per core (max. 16: daarboven voegt de CP-SAT-portfolio weinig toe)
+    solver.parameters.num_workers = min(16, os.cpu_count() or 8)
 
     status = solver.Solve(model)
     if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
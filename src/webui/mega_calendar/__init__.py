@@ -11,6 +11,12 @@ _calendar_component = components.declare_component(
     path=_FRONTEND_DIR,
 )
 
+# Eén keer aangemaakt en bij elke rerun hergebruikt; worden nooit gemuteerd
+_DEFAULT_CALLBACKS: List[str] = ["dateClick", "eventClick", "eventChange", "eventsSet", "select", "selectSubmit"]
+_DEFAULT_LICENSE = "CC-Attribution-NonCommercial-NoDerivatives"
+_EMPTY_LIST: List[Any] = []
+_EMPTY_DICT: Dict[str, Any] = {}
+
 
 def calendar(
     events: List[Dict[str, Any]] | None = None,
@@ -36,14 +42,14 @@ def calendar(
     """
 
     component_value = _calendar_component(
-        events=events or [],
-        options=options or {},
+        events=events or _EMPTY_LIST,
+        options=options or _EMPTY_DICT,
         custom_css=custom_css,
-        callbacks=callbacks or ["dateClick", "eventClick", "eventChange", "eventsSet", "select", "selectSubmit"],
-        license_key=license_key or "CC-Attribution-NonCommercial-NoDerivatives",
-        meta=meta or {},
+        callbacks=callbacks or _DEFAULT_CALLBACKS,
+        license_key=license_key or _DEFAULT_LICENSE,
+        meta=meta or _EMPTY_DICT,
         key=key,
-        default={},
+        default=_EMPTY_DICT,
     )
     return component_value or {}
 